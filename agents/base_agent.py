@@ -1,45 +1,120 @@
+import asyncio
+import functools
+import uuid
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
-from langchain_community.chat_models import BedrockChat
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import BaseMessage
+from typing import Any, AsyncIterator, Dict, List, Optional
+from langchain.schema import SystemMessage
+from agents.entities import Entities, format_entities
+from services.registry import ServiceRegistry, DEFAULT_MODEL_ID, DEFAULT_REGION
 
 class BaseAgent(ABC):
     """Base class for all customer service agents."""
     
-    def __init__(self, model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0", region: str = "us-west-2"):
-        """Initialize the agent with a Bedrock model."""
-        self.llm = BedrockChat(
-            model_id=model_id,
-            model_kwargs={"temperature": 0.7, "max_tokens": 2048},
-            region_name=region
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, region: str = DEFAULT_REGION,
+                 registry: Optional[ServiceRegistry] = None):
+        """Initialize the agent with a Bedrock model.
+        
+        Agents created with the same registry share its LLM client and services.
+        """
+        self.registry = registry or ServiceRegistry(model_id=model_id, region=region)
+        self.llm = self.registry.llm
+    
+    def _system_message(self, prefix: str) -> SystemMessage:
+        """Static system prompt, followed by a cache checkpoint if prompt caching is on.
+        
+        The provider can only reuse the prefix if it is byte-identical on every
+        turn, so it must not contain anything that varies per request.
+        """
+        if self.registry.prompt_cache:
+            return SystemMessage(content=[{"type": "text", "text": prefix}, {"cachePoint": {"type": "default"}}])
+        return SystemMessage(content=prefix)
+    
+    def _format_history(self, conversation_id: Optional[str], history: Optional[List[Dict[str, str]]],
+                        summary: Optional[str] = None, **kwargs) -> str:
+        """Format the history window through the registry's shared formatter."""
+        return self.registry.history_formatter.format(conversation_id, history or [], summary, **kwargs)
+    
+    @staticmethod
+    def _format_order_info(order_info: Optional[dict], entities: Optional[Entities] = None) -> str:
+        """Format order information, plus amounts and regions the customer mentioned, for the prompt."""
+        mentioned = format_entities(entities)
+        if not order_info:
+            details = "No specific order information provided."
+            return f"{details}\n{mentioned}" if mentioned else details
+        
+        details = (
+            f"Order Details:\n"
+            f"- Order ID: {order_info['order_id']}\n"
+            f"- Customer: {order_info['customer_name']}\n"
+            f"- Items: {', '.join(order_info['items'])}\n"
+            f"- Status: {order_info['status']}\n"
+            f"- Delivery Address: {order_info['address']}"
         )
-        self.conversation_history: Dict[str, list[BaseMessage]] = {}
+        return f"{details}\n{mentioned}" if mentioned else details
     
-    def _get_history(self, conversation_id: str) -> list[BaseMessage]:
-        """Get conversation history for a specific conversation."""
-        return self.conversation_history.get(conversation_id, [])
+    @staticmethod
+    def _content_text(content: Any) -> str:
+        """Text of a message or chunk, whose content may be a list of content blocks."""
+        if isinstance(content, str):
+            return content
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
     
-    def _update_history(self, conversation_id: str, user_message: str, assistant_message: str):
-        """Update conversation history with new messages."""
-        if conversation_id not in self.conversation_history:
-            self.conversation_history[conversation_id] = []
+    @functools.cached_property
+    def chain(self):
+        """The agent's prompt piped into the model.
         
-        self.conversation_history[conversation_id].extend([
-            {"role": "user", "content": user_message},
-            {"role": "assistant", "content": assistant_message}
-        ])
+        Built on first use, after the subclass has set ``self.prompt``, and
+        reused for every request.
+        """
+        return self.prompt | self.llm
     
     @abstractmethod
+    def _build_inputs(self, user_input: str, conversation_id: Optional[str], **kwargs) -> Dict[str, str]:
+        """Build the prompt inputs for the agent's chain.
+        
+        Args:
+            user_input: The user's message
+            conversation_id: Conversation ID for maintaining context
+            **kwargs: Additional arguments specific to each agent
+        """
+        pass
+    
     def process(self, user_input: str, conversation_id: Optional[str] = None, **kwargs) -> tuple[str, str]:
         """Process user input and return a response.
         
         Args:
             user_input: The user's message
             conversation_id: Optional conversation ID for maintaining context
-            **kwargs: Additional arguments specific to each agent
+            **kwargs: Additional arguments specific to each agent, see _build_inputs()
             
         Returns:
             tuple[str, str]: (response message, conversation_id)
         """
-        pass
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+        
+        response = self.chain.invoke(self._build_inputs(user_input, conversation_id, **kwargs))
+        
+        return self._content_text(response.content), conversation_id
+    
+    async def aprocess(self, user_input: str, conversation_id: Optional[str] = None, **kwargs) -> tuple[str, str]:
+        """Asynchronous variant of process() that awaits the agent chain.
+        
+        The inputs are built in a worker thread, as looking up an order may wait
+        for the order files (e.g. for another worker's lock in shared mode).
+        """
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+        
+        inputs = await asyncio.to_thread(self._build_inputs, user_input, conversation_id, **kwargs)
+        response = await self.chain.ainvoke(inputs)
+        
+        return self._content_text(response.content), conversation_id
+    
+    async def astream(self, user_input: str, conversation_id: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """Stream the response token by token as the chain generates it."""
+        inputs = await asyncio.to_thread(self._build_inputs, user_input, conversation_id, **kwargs)
+        async for chunk in self.chain.astream(inputs):
+            text = self._content_text(chunk.content)
+            if text:
+                yield text
@@ -0,0 +1,63 @@
+import re
+from typing import List, NamedTuple, Optional
+
+# Places the logistics SOP treats as "Middle East regions"
+MIDDLE_EAST = (
+    "middle east", "uae", "united arab emirates", "dubai", "abu dhabi", "sharjah", "saudi arabia",
+    "saudi", "ksa", "riyadh", "jeddah", "dammam", "qatar", "doha", "kuwait", "bahrain", "oman",
+    "muscat", "jordan", "amman", "lebanon", "beirut", "egypt", "cairo", "iraq", "israel",
+)
+
+# One alternation with a named group per entity, so a single scan of the
+# lower-cased text finds all of them (much faster than re.IGNORECASE). Order ids
+# keep the wording accepted before ("order 123", "order id 123", "order number #123").
+AMOUNT = r"\d[\d,]*(?:\.\d{1,2})?"
+ENTITY_PATTERN = re.compile(
+    r"\b(?:order\s+(?:id\s+)?(?:number\s+)?(?:#\s*)?(?P<order_id>\d+)"
+    r"|(?P<region>" + "|".join(re.escape(name).replace(r"\ ", r"\s+") for name in MIDDLE_EAST) + r")\b"
+    r"|usd\s*(?P<usd_amount>" + AMOUNT + r")"
+    r"|(?P<suffixed_amount>" + AMOUNT + r")\s*(?:dollars|usd)\b)"
+    r"|\$\s*(?P<dollar_amount>" + AMOUNT + r")"
+)
+ACRONYMS = {"uae", "ksa"}
+
+
+class Entities(NamedTuple):
+    """Entities mentioned in one customer message, in order of appearance."""
+    order_ids: List[str]
+    amounts: List[float]
+    regions: List[str]
+
+    @property
+    def order_id(self) -> Optional[str]:
+        return self.order_ids[0] if self.order_ids else None
+
+
+def extract_entities(text: str) -> Entities:
+    """Pull order ids, money amounts and Middle East regions out of a message in one pass."""
+    order_ids, amounts, regions = [], [], []
+    for match in ENTITY_PATTERN.finditer(text.lower()):
+        order_id, region = match.group("order_id", "region")
+        if order_id:
+            order_ids.append(order_id)
+        elif region:
+            region = " ".join(region.split())
+            region = region.upper() if region in ACRONYMS else region.title()
+            if region not in regions:
+                regions.append(region)
+        else:
+            value = match.group("dollar_amount") or match.group("usd_amount") or match.group("suffixed_amount")
+            amounts.append(float(value.replace(",", "")))
+    return Entities(order_ids, amounts, regions)
+
+
+def format_entities(entities: Optional[Entities]) -> str:
+    """Prompt lines for the amounts and regions a customer mentioned, or ''."""
+    if not entities:
+        return ""
+    lines = []
+    if entities.amounts:
+        lines.append(f"- Amount mentioned: {', '.join(f'${amount:,.2f}' for amount in entities.amounts)}")
+    if entities.regions:
+        lines.append(f"- Region mentioned: {', '.join(entities.regions)} (Middle East)")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (roughly four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def format_message(message: Dict[str, str]) -> str:
+    return f"{message['role'].capitalize()}: {message['content']}"
+
+
+def format_history(history: List[Dict[str, str]], summary: Optional[str] = None,
+                   empty: str = "No previous conversation.") -> str:
+    """Format a running summary plus the verbatim recent messages for a prompt."""
+    lines = []
+    if summary:
+        lines.append(f"Summary of earlier conversation:\n{summary}\n")
+    lines.extend(format_message(msg) for msg in history)
+    if not lines:
+        return empty
+    return "\n".join(lines)
+
+
+class HistoryFormatter:
+    """Formats prompt history, reusing what was already formatted for a conversation.
+
+    Per conversation the last formatted window is kept: its messages, their
+    formatted lines and the joined text. Formatting the same window again (the
+    intent and specialist agents both do on every turn) returns the text as is,
+    a window that only gained messages appends the new lines to it, and a
+    window that slid forward reuses the lines of the messages it kept. Windows
+    are kept for the ``max_conversations`` most recently formatted
+    conversations. The output is the same as format_history().
+    """
+
+    def __init__(self, max_conversations: int = 1000):
+        self.max_conversations = max_conversations
+        # conversation id -> (messages, formatted lines, joined lines)
+        self._windows: "OrderedDict[str, Tuple[List[Dict[str, str]], List[str], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _format_window(self, cached: Optional[tuple], history: List[Dict[str, str]]) -> tuple:
+        if cached is None or not history:
+            lines = [format_message(msg) for msg in history]
+            return history, lines, "\n".join(lines)
+        messages, lines, text = cached
+        # List comparison checks identity before equality, so unchanged messages are cheap
+        if len(messages) <= len(history) and messages == history[:len(messages)]:
+            if len(messages) == len(history):
+                return cached
+            new_lines = [format_message(msg) for msg in history[len(messages):]]
+            prefix = text + "\n" if text else ""
+            return history, lines + new_lines, prefix + "\n".join(new_lines)
+        # The window slid forward: reuse the lines of the messages it kept
+        reused: List[str] = []
+        for start, message in enumerate(messages):
+            if message is history[0] or message == history[0]:
+                kept = messages[start:start + len(history)]
+                if kept == history[:len(kept)]:
+                    reused = lines[start:start + len(kept)]
+                break
+        lines = reused + [format_message(msg) for msg in history[len(reused):]]
+        return history, lines, "\n".join(lines)
+
+    def format(self, conversation_id: Optional[str], history: List[Dict[str, str]],
+               summary: Optional[str] = None, empty: str = "No previous conversation.") -> str:
+        """Format a running summary plus the recent messages, like format_history()."""
+        if not conversation_id:
+            return format_history(history, summary, empty)
+        with self._lock:
+            window = self._format_window(self._windows.get(conversation_id), history)
+            self._windows[conversation_id] = window
+            self._windows.move_to_end(conversation_id)
+            if len(self._windows) > self.max_conversations:
+                self._windows.popitem(last=False)
+        text = window[2]
+        if summary:
+            heading = f"Summary of earlier conversation:\n{summary}\n"
+            return f"{heading}\n{text}" if text else heading
+        return text or empty
+
+
+def extractive_summarizer(summary: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """Fold messages into a summary by keeping the first sentence of each.
+
+    Only the newly folded messages are processed; the existing summary is kept
+    as is and trimmed from the oldest line once it exceeds ``max_tokens``.
+    """
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        first_sentence = SENTENCE_END.split(message["content"].strip(), maxsplit=1)[0]
+        if len(first_sentence) > 160:
+            first_sentence = first_sentence[:157] + "..."
+        lines.append(f"- {message['role'].capitalize()}: {first_sentence}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class HistoryWindow:
+    """Keeps the history part of agent prompts within a fixed token budget.
+
+    The last ``max_recent_messages`` messages (further limited to ``max_tokens``)
+    are sent verbatim. Older messages are folded into a running summary stored
+    on the conversation as ``summary``, with ``summarized_upto`` marking how many
+    messages it already covers, so each turn only summarizes what newly fell
+    out of the window.
+    """
+
+    def __init__(self, max_recent_messages: int = 6, max_tokens: int = 1000,
+                 summary_max_tokens: int = 300,
+                 summarizer: Callable[[str, List[Dict[str, str]], int], str] = extractive_summarizer):
+        self.max_recent_messages = max_recent_messages
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+
+    def _window_start(self, history: List[Dict[str, str]]) -> int:
+        """Index of the oldest message that still fits in the verbatim window."""
+        start = len(history)
+        used = 0
+        while start > 0 and len(history) - start < self.max_recent_messages:
+            cost = estimate_tokens(format_message(history[start - 1]))
+            if used + cost > self.max_tokens and start < len(history):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def update(self, conversation: Dict[str, Any]) -> tuple[List[Dict[str, str]], Optional[str]]:
+        """Fold messages that left the window into the summary.
+
+        Returns:
+            tuple: (recent messages to send verbatim, running summary or None)
+        """
+        history = conversation["history"]
+        summarized_upto = conversation.get("summarized_upto", 0)
+        start = max(self._window_start(history), summarized_upto)
+        if start > summarized_upto:
+            conversation["summary"] = self.summarizer(
+                conversation.get("summary", ""), history[summarized_upto:start], self.summary_max_tokens
+            )
+            conversation["summarized_upto"] = start
+        return history[start:], conversation.get("summary") or None
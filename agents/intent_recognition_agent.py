@@ -1,12 +1,22 @@
+import threading
+import time
+import uuid
 from typing import Optional, List, Dict
 from langchain.prompts import ChatPromptTemplate
 from agents.base_agent import BaseAgent
+from agents.intent_rules import RuleBasedIntentClassifier
 
 class IntentRecognitionAgent(BaseAgent):
     """Agent for recognizing customer intent from their questions."""
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, confidence_threshold: float = 0.8,
+                 classifier: Optional[RuleBasedIntentClassifier] = None, **kwargs):
         super().__init__(*args, **kwargs)
+        # Local fast path; the LLM is only consulted below this confidence
+        self.classifier = classifier or RuleBasedIntentClassifier()
+        self.confidence_threshold = confidence_threshold
+        self._stats = {"rule_hits": 0, "llm_calls": 0, "rule_seconds": 0.0, "llm_seconds": 0.0}
+        self._stats_lock = threading.Lock()
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are an intent recognition system for fashion e-commerce customer service.
 Your task is to analyze customer questions and determine if they are related to:
@@ -20,13 +30,66 @@ DO NOT RESPOND WITH A FULL SENTENCE."""),
             ("human", "Conversation history:\n{history}\n\nCurrent question: {question}")
         ])
     
-    def process(self, user_input: str, conversation_id: Optional[str] = None, history: List[Dict[str, str]] = None, **kwargs) -> tuple[str, str]:
+    def _build_inputs(self, user_input: str, conversation_id: Optional[str],
+                      history: Optional[List[Dict[str, str]]] = None, summary: Optional[str] = None,
+                      **kwargs) -> Dict[str, str]:
+        """Build the prompt inputs for the intent chain."""
+        formatted_history = self._format_history(conversation_id, history, summary, empty="")
+        return {"history": formatted_history, "question": user_input}
+    
+    def _record(self, key: str, seconds_key: str, seconds: float) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+            self._stats[seconds_key] += seconds
+    
+    def classify_locally(self, user_input: str) -> Optional[str]:
+        """Try the rule-based classifier; return an intent only if it is confident.
+        
+        Returns None when the question needs the LLM.
+        """
+        start = time.perf_counter()
+        intent, confidence = self.classifier.classify(user_input)
+        elapsed = time.perf_counter() - start
+        if intent is not None and confidence >= self.confidence_threshold:
+            self._record("rule_hits", "rule_seconds", elapsed)
+            return intent
+        return None
+    
+    def get_stats(self) -> Dict[str, float]:
+        """Fast-path hit rate and average latency of each classification path."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = stats["rule_hits"] + stats["llm_calls"]
+        return {
+            "requests": total,
+            "rule_hits": stats["rule_hits"],
+            "llm_calls": stats["llm_calls"],
+            "rule_hit_rate": stats["rule_hits"] / total if total else 0.0,
+            "avg_rule_latency_us": stats["rule_seconds"] / stats["rule_hits"] * 1e6 if stats["rule_hits"] else 0.0,
+            "avg_llm_latency_ms": stats["llm_seconds"] / stats["llm_calls"] * 1e3 if stats["llm_calls"] else 0.0
+        }
+    
+    def _parse_intent(self, content: str) -> str:
+        """Validate and normalize the raw model output into an intent label."""
+        intent = content.strip().upper()
+        if "ORDER" in intent:
+            return "ORDER"
+        elif "LOGISTICS" in intent:
+            return "LOGISTICS"
+        return "UNKNOWN"
+    
+    def process(self, user_input: str, conversation_id: Optional[str] = None, history: List[Dict[str, str]] = None,
+                summary: Optional[str] = None, **kwargs) -> tuple[str, str]:
         """Process user input to determine their intent.
         
+        Confident matches from the rule-based classifier are returned without
+        calling the LLM.
+        
         Args:
             user_input: The user's question
             conversation_id: Optional conversation ID for maintaining context
-            history: List of previous messages in the conversation
+            history: List of recent messages in the conversation
+            summary: Optional running summary of older messages
             
         Returns:
             tuple[str, str]: (intent type ("ORDER" or "LOGISTICS"), conversation_id)
@@ -34,20 +97,29 @@ DO NOT RESPOND WITH A FULL SENTENCE."""),
         if not conversation_id:
             conversation_id = str(uuid.uuid4())
         
-        # Format conversation history
-        formatted_history = "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in (history or [])])
+        intent = self.classify_locally(user_input)
+        if intent:
+            return intent, conversation_id
         
         # Get chain response
-        chain = self.prompt | self.llm
-        response = chain.invoke({"history": formatted_history, "question": user_input})
-        intent = response.content.strip().upper()
+        start = time.perf_counter()
+        response = self.chain.invoke(self._build_inputs(user_input, conversation_id, history, summary))
+        self._record("llm_calls", "llm_seconds", time.perf_counter() - start)
         
-        # Validate and normalize intent
-        if "ORDER" in intent:
-            intent = "ORDER"
-        elif "LOGISTICS" in intent:
-            intent = "LOGISTICS"
-        else:
-            intent = "UNKNOWN"
+        return self._parse_intent(self._content_text(response.content)), conversation_id
+    
+    async def aprocess(self, user_input: str, conversation_id: Optional[str] = None, history: List[Dict[str, str]] = None,
+                       summary: Optional[str] = None, **kwargs) -> tuple[str, str]:
+        """Asynchronous variant of process() that awaits the intent chain."""
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+        
+        intent = self.classify_locally(user_input)
+        if intent:
+            return intent, conversation_id
+        
+        start = time.perf_counter()
+        response = await self.chain.ainvoke(self._build_inputs(user_input, conversation_id, history, summary))
+        self._record("llm_calls", "llm_seconds", time.perf_counter() - start)
         
-        return intent, conversation_id
+        return self._parse_intent(self._content_text(response.content)), conversation_id
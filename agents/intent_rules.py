@@ -0,0 +1,67 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# (pattern, weight) pairs per intent. Patterns are matched case-insensitively
+# against the customer's question; the label with the highest total weight wins.
+INTENT_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "ORDER": [
+        (r"\b(order|purchase)\s+status\b", 3.0),
+        (r"\bstatus\s+of\s+(my\s+)?(order|purchase)\b", 3.0),
+        (r"\bwhere\s+is\s+my\s+order\b", 2.0),
+        (r"\b(cancel|delete|modify|edit)\b.{0,30}\border\b", 3.0),
+        (r"\badd\b.{0,20}\bitems?\b.{0,20}\border\b", 3.0),
+        (r"\b(remove|swap)\b.{0,20}\bitems?\b", 2.0),
+        (r"\b(payment|paid|pay|charged|invoice|receipt)\b", 2.0),
+        (r"\b(size|colou?r)\b.{0,20}\b(change|wrong)\b", 1.5),
+        (r"\border\b", 0.5),
+    ],
+    "LOGISTICS": [
+        (r"\b(delivery|shipping)\s+address\b", 3.0),
+        (r"\b(change|update|wrong)\b.{0,20}\baddress\b", 3.0),
+        (r"\b(package|parcel|shipment)\b", 2.0),
+        (r"\b(tracking|track)\b", 2.0),
+        (r"\b(carrier|courier|dhl|ups|fedex|usps)\b", 2.0),
+        (r"\b(deliver(y|ed)?|redeliver(y)?|shipping|shipped)\b", 1.5),
+        (r"\b(not|never)\s+(received|arrived)\b", 3.0),
+        (r"\bmissing\s+items?\b", 2.0),
+        (r"\b(pick\s*up|pickup)\b", 2.0),
+        (r"\b(customs|duty|duties)\b", 2.0),
+        (r"\b(eta|estimated\s+delivery|late|delayed|delay)\b", 2.0),
+        (r"\breturned\s+to\s+sender\b", 3.0),
+    ],
+}
+
+
+class RuleBasedIntentClassifier:
+    """Keyword/regex classifier used as a fast path before the LLM.
+
+    Rules are compiled once; each matching rule adds its weight to its label.
+    Confidence is the winning label's share of the total score, and questions
+    whose best label scores below ``min_score`` return no intent.
+    """
+
+    def __init__(self, rules: Dict[str, List[Tuple[str, float]]] = INTENT_RULES, min_score: float = 2.0):
+        self.min_score = min_score
+        self._rules = [
+            (intent, re.compile(pattern, re.IGNORECASE), weight)
+            for intent, patterns in rules.items()
+            for pattern, weight in patterns
+        ]
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Total rule weight per intent."""
+        totals: Dict[str, float] = {}
+        for intent, pattern, weight in self._rules:
+            if pattern.search(text):
+                totals[intent] = totals.get(intent, 0.0) + weight
+        return totals
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """Return (intent, confidence), or (None, 0.0) if no rule is strong enough."""
+        totals = self.scores(text)
+        if not totals:
+            return None, 0.0
+        intent, best = max(totals.items(), key=lambda item: item[1])
+        if best < self.min_score:
+            return None, 0.0
+        return intent, best / sum(totals.values())
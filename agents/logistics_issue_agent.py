@@ -1,24 +1,27 @@
 from typing import Optional, List, Dict
 from langchain.prompts import ChatPromptTemplate
 from agents.base_agent import BaseAgent
-from services.order_service import OrderService
-from services.sop_service import SOPService
+from agents.entities import Entities
 
 class LogisticsIssueAgent(BaseAgent):
     """Agent for handling logistics-related customer issues."""
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.order_service = OrderService()
-        self.sop_service = SOPService()
+        self.order_service = self.registry.order_service
+        self.sop_service = self.registry.sop_service
         
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a customer service agent for logistics issues.
-Follow the decision tree below to handle customer inquiries:
-{decision_tree}
-
-Previous conversation:
-{history}
+        # Static prefix, identical on every turn so the provider can cache it.
+        # With prompt caching the full decision tree is part of it and each turn
+        # only points at the relevant steps; otherwise only the relevant branches
+        # are sent with the question.
+        self.decision_tree = self.sop_service.logistics_tree
+        if self.registry.prompt_cache:
+            tree_instructions = f"Follow the decision tree below to handle customer inquiries:\n{self.decision_tree.text}"
+        else:
+            tree_instructions = "Follow the decision tree sent with each question to handle customer inquiries."
+        self.prompt_prefix = f"""You are a customer service agent for logistics issues.
+{tree_instructions}
 
 Guidelines:
 - PLEASE FOLLOW THE DECISION TREE AND DO NOT RESPOND RANDOMLY
@@ -26,63 +29,55 @@ Guidelines:
 - THIS IS INSTANT MESSAGING, KEEP RESPONSES SHORT AND CONCISE
 - DO NOT USE PHRASES LIKE "BEST REGARDS" OR OTHER FORMAL CLOSINGS
 - DO NOT RESPOND AS THE CUSTOMER
-- PAY SPECIAL ATTENTION TO DELIVERY TIMEFRAMES AND COMPENSATION POLICIES"""),
-            ("human", """Order Information:
+- PAY SPECIAL ATTENTION TO DELIVERY TIMEFRAMES AND COMPENSATION POLICIES"""
+        self.prompt = ChatPromptTemplate.from_messages([
+            self._system_message(self.prompt_prefix),
+            ("human", """{decision_tree}Previous conversation:
+{history}
+
+Order Information:
 {order_info}
 
 Customer Question: {question}""")
         ])
     
-    def _format_order_info(self, order_info: Optional[dict]) -> str:
-        """Format order information for the prompt."""
-        if not order_info:
-            return "No specific order information provided."
+    def _decision_tree_section(self, user_input: str, history: Optional[List[Dict[str, str]]]) -> str:
+        """The per-question part of the decision tree for the prompt suffix.
         
-        return (
-            f"Order Details:\n"
-            f"- Order ID: {order_info['order_id']}\n"
-            f"- Customer: {order_info['customer_name']}\n"
-            f"- Items: {', '.join(order_info['items'])}\n"
-            f"- Status: {order_info['status']}\n"
-            f"- Delivery Address: {order_info['address']}"
-        )
-    
-    def _format_history(self, history: List[Dict[str, str]]) -> str:
-        """Format conversation history."""
-        if not history:
-            return "No previous conversation."
-        return "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in history])
+        The customer's earlier messages in the history window keep the branch
+        the conversation is in relevant on follow-up questions.
+        """
+        earlier = [message["content"] for message in history or [] if message["role"] == "user"]
+        if earlier and earlier[-1] == user_input:
+            earlier.pop()
+        if not self.registry.prompt_cache:
+            return f"Decision tree:\n{self.decision_tree.relevant_text(user_input, earlier)}\n\n"
+        nodes = self.decision_tree.match_conversation(user_input, earlier)
+        if not nodes:
+            return ""
+        return f"Most relevant decision tree steps: {', '.join(node.node_id for node in nodes)}\n\n"
     
-    def process(self, user_input: str, conversation_id: Optional[str] = None, 
-                order_id: Optional[str] = None, history: List[Dict[str, str]] = None, **kwargs) -> tuple[str, str]:
-        """Process logistics-related customer inquiries.
+    def _build_inputs(self, user_input: str, conversation_id: Optional[str], order_id: Optional[str] = None,
+                      history: Optional[List[Dict[str, str]]] = None, summary: Optional[str] = None,
+                      entities: Optional[Entities] = None, **kwargs) -> Dict[str, str]:
+        """Build the prompt inputs for logistics-related customer inquiries.
         
         Args:
             user_input: The user's question
-            conversation_id: Optional conversation ID for maintaining context
+            conversation_id: Conversation ID for maintaining context
             order_id: Optional order ID if already known
-            history: List of previous messages in the conversation
-            
-        Returns:
-            tuple[str, str]: (response message, conversation_id)
+            history: List of recent messages in the conversation
+            summary: Optional running summary of older messages
+            entities: Optional amounts and regions mentioned in the question
         """
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-        
         # Get order information if order ID is provided
         order_info = None
         if order_id:
             order_info = self.order_service.get_order_info(order_id)
         
-        # Prepare the chain
-        chain = self.prompt | self.llm
-        
-        # Get response
-        response = chain.invoke({
-            "decision_tree": self.sop_service.logistics_decision_tree,
-            "history": self._format_history(history or []),
-            "order_info": self._format_order_info(order_info),
+        return {
+            "decision_tree": self._decision_tree_section(user_input, history),
+            "history": self._format_history(conversation_id, history, summary),
+            "order_info": self._format_order_info(order_info, entities),
             "question": user_input
-        })
-        
-        return response.content, conversation_id
+        }
@@ -0,0 +1,57 @@
+"""Compare per-order calls with the batch order operations.
+
+Reads and updates the addresses of N orders one call at a time (as a client
+of get_order_info/update_order_address has to) and with one get_orders and
+one update_order_addresses call. Each single update is its own fsynced journal
+record, the batch is one.
+
+Usage: python benchmarks/bench_batch_orders.py [orders]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.order_service import OrderService
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as directory:
+        service = OrderService(os.path.join(directory, "orders.json"))
+        service.save_order_data([
+            {"order_id": str(i), "customer_name": f"Customer {i}", "items": ["T-shirt"],
+             "address": "Xicheng District, Beijing", "status": "Processing"}
+            for i in range(count)
+        ])
+        order_ids = [str(i) for i in range(count)]
+
+        def read_singly():
+            for order_id in order_ids:
+                service.get_order_info(order_id)
+                service.get_order_version(order_id)
+
+        def update_singly():
+            for order_id in order_ids:
+                service.update_address(order_id, f"Address {order_id}")
+
+        def read_batch():
+            service.get_orders(order_ids)
+            service.get_order_versions(order_ids)
+
+        def update_batch():
+            service.update_addresses([{"order_id": order_id, "new_address": f"Moved {order_id}"}
+                                      for order_id in order_ids])
+
+        print(f"{count} orders          single calls    batch call")
+        print(f"read            {timed(read_singly):>12.1f} ms {timed(read_batch):>10.1f} ms")
+        print(f"update address  {timed(update_singly):>12.1f} ms {timed(update_batch):>10.1f} ms")
+        service.close()
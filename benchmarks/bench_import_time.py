@@ -0,0 +1,49 @@
+"""Measure how long importing each entry module takes and how much memory it uses.
+
+Every module is imported in a fresh interpreter so results are not skewed by
+modules already loaded. The server should only pay for the core system, not
+for the audio stack used by the voice client.
+
+Usage: python benchmarks/bench_import_time.py [runs]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["customer_service", "server", "main"]
+
+PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+audio = sorted(name for name in ("pyaudio", "pygame", "amazon_transcribe", "boto3") if name in sys.modules)
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss_kb, ",".join(audio) or "-")
+"""
+
+
+def measure(module: str):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    elapsed, rss_kb, audio = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), int(rss_kb), audio
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':>18} {'import ms':>10} {'max RSS MB':>11}  audio/AWS modules loaded")
+    for module in MODULES:
+        samples = [measure(module) for _ in range(runs)]
+        if any(sample is None for sample in samples):
+            print(f"{module:>18} {'failed':>10}")
+            continue
+        elapsed = sorted(sample[0] for sample in samples)[len(samples) // 2]
+        rss_mb = max(sample[1] for sample in samples) / 1024
+        print(f"{module:>18} {elapsed * 1000:>10.1f} {rss_mb:>11.1f}  {samples[0][2]}")
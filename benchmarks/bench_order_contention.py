@@ -0,0 +1,77 @@
+"""Measure OrderService.update_address throughput under concurrent writers.
+
+Each writer thread updates its own order. With group commit one journal
+fsync covers the updates of all writers waiting for it, so throughput should
+grow with the writer count while the fsyncs per update drop. The effect
+depends on how long an fsync takes; on a fast or memory-backed disk the run
+is CPU bound instead. ``fsync_ms`` adds that much latency to every fsync to
+mimic a slower disk.
+
+Usage: python benchmarks/bench_order_contention.py [updates_per_writer] [fsync_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.order_service import OrderService
+
+WRITER_COUNTS = [1, 2, 4, 8, 16]
+
+fsync_calls = 0
+_fsync = os.fsync
+
+
+def counted_fsync(fd: int, delay: float = 0.0) -> None:
+    global fsync_calls
+    fsync_calls += 1
+    _fsync(fd)
+    if delay:
+        time.sleep(delay)
+
+
+def run(writers: int, updates_per_writer: int) -> tuple:
+    global fsync_calls
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "orders.json")
+        service = OrderService(data_file)
+        service.save_order_data([
+            {"order_id": str(i), "customer_name": f"Customer {i}", "items": ["Item"],
+             "address": "Initial", "status": "Processing"}
+            for i in range(writers)
+        ])
+
+        barrier = threading.Barrier(writers + 1)
+
+        def writer(order_id: str):
+            barrier.wait()
+            for n in range(updates_per_writer):
+                service.update_address(order_id, f"Address {n}")
+
+        threads = [threading.Thread(target=writer, args=(str(i),)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        fsync_calls = 0
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        fsyncs = fsync_calls
+        service.close()
+        return writers * updates_per_writer / elapsed, fsyncs / (writers * updates_per_writer)
+
+
+if __name__ == "__main__":
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.0
+    os.fsync = lambda fd: counted_fsync(fd, delay)
+    baseline = None
+    print(f"{'writers':>8} {'updates/s':>12} {'speedup':>8} {'fsyncs/update':>14}")
+    for count in WRITER_COUNTS:
+        throughput, fsyncs_per_update = run(count, updates)
+        baseline = baseline or throughput
+        print(f"{count:>8} {throughput:>12.0f} {throughput / baseline:>7.2f}x {fsyncs_per_update:>14.2f}")
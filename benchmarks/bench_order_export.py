@@ -0,0 +1,56 @@
+"""Compare exporting all orders at once with the paged NDJSON export.
+
+Loads N orders into an OrderService, then serializes all of them once through
+get_order_data() (one list of copies, dumped as one JSON document) and once
+through export_ndjson(). Prints the time until the first output is available,
+the total time and the peak memory allocated by the export itself (the
+in-memory order index is loaded beforehand and not counted).
+
+Usage: python benchmarks/bench_order_export.py [orders]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.order_service import OrderService
+
+
+def measure(export) -> tuple:
+    start = time.perf_counter()
+    first = None
+    for _ in export():
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    # Memory is traced in a separate run, as tracing slows allocations down
+    tracemalloc.start()
+    for _ in export():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first * 1e3, total * 1e3, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        service = OrderService(os.path.join(directory, "orders.json"))
+        service.save_order_data([
+            {"order_id": str(i), "customer_name": f"Customer {i}", "items": ["T-shirt", "Jeans"],
+             "address": f"{i} Xicheng District, Beijing", "status": ("Processing", "Shipped", "Delivered")[i % 3]}
+            for i in range(count)
+        ])
+
+        def export_all():
+            yield json.dumps({"orders": service.get_order_data()}, ensure_ascii=False)
+
+        print(f"{count} orders   first output   total     peak memory")
+        for name, export in (("all at once", export_all), ("paged NDJSON", service.export_ndjson)):
+            first, total, peak = measure(export)
+            print(f"{name:<13} {first:>9.1f} ms {total:>8.0f} ms {peak:>9.1f} MiB")
+        service.close()
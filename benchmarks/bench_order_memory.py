@@ -0,0 +1,85 @@
+"""Compare the memory and cold-load time of order dicts and compact order records.
+
+Writes N orders as the pretty-printed JSON snapshot OrderService uses, then
+prints:
+- the memory per order of the dicts json.load() returns and of OrderRecords
+- the time to parse the JSON file and the binary snapshot, and to fully load
+  an OrderStore (records plus indexes) from each
+
+Usage: python benchmarks/bench_order_memory.py [orders]
+"""
+import gc
+import json
+import marshal
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.order_record import OrderRecord
+from services.order_store import OrderStore
+
+STATUSES = ("Processing", "Shipped", "Delivered")
+ITEMS = ("T-shirt", "Jeans", "Dress", "Shoes", "Jacket", "Hat")
+
+
+def traced_mib(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 2 ** 20
+
+
+def timed_ms(function) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+def load_store(data_file: str, binary_snapshot: bool) -> None:
+    store = OrderStore(data_file, binary_snapshot=binary_snapshot)
+    assert store.load()
+    store.journal.close()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "orders.json")
+        with open(data_file, "w") as file:
+            json.dump([
+                {"order_id": str(i), "customer_name": f"Customer {i}",
+                 "items": [ITEMS[i % 6], ITEMS[(i + 1) % 6]],
+                 "address": f"{i} Xicheng District, Beijing", "status": STATUSES[i % 3]}
+                for i in range(count)
+            ], file, indent=2)
+
+        def load_json():
+            with open(data_file) as file:
+                return json.load(file)
+
+        orders = load_json()
+        dict_mib = traced_mib(load_json)
+        record_mib = traced_mib(lambda: [OrderRecord.from_dict(order) for order in load_json()])
+        del orders
+        print(f"{count} orders, {os.path.getsize(data_file) / 2 ** 20:.0f} MiB of JSON")
+        print(f"memory per order: dict {dict_mib * 2 ** 20 / count:.0f} B, "
+              f"OrderRecord {record_mib * 2 ** 20 / count:.0f} B")
+
+        load_store(data_file, binary_snapshot=True)  # writes the binary snapshot
+
+        def load_snapshot():
+            with open(f"{data_file}.snapshot", "rb") as file:
+                return marshal.loads(file.read())
+
+        print(f"json.load:                     {timed_ms(load_json):>8.0f} ms")
+        print(f"marshal snapshot:              {timed_ms(load_snapshot):>8.0f} ms")
+        print(f"OrderStore load from JSON:     {timed_ms(lambda: load_store(data_file, False)):>8.0f} ms")
+        print(f"OrderStore load from snapshot: {timed_ms(lambda: load_store(data_file, True)):>8.0f} ms")
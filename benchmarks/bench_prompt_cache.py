@@ -0,0 +1,67 @@
+"""Check that the specialist prompts start with a byte-identical prefix.
+
+Runs a multi-turn conversation through the order and logistics agents with a
+fake LLM that records every prompt, asserts that the system message (the part
+covered by the prompt-cache checkpoint) never changes between turns, and
+prints how many estimated tokens are in the cacheable prefix and in the
+per-turn suffix.
+
+Usage: python benchmarks/bench_prompt_cache.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from agents.history import estimate_tokens
+from agents.logistics_issue_agent import LogisticsIssueAgent
+from agents.order_issue_agent import OrderIssueAgent
+from services.order_service import OrderService
+from services.registry import ServiceRegistry
+
+TURNS = [
+    ("What's the status of order 123?", "123"),
+    ("My package is late, it has been 10 days", "123"),
+    ("The courier tried to deliver but I wasn't home", "456"),
+    ("Can I add a hat to my order?", "789"),
+]
+
+
+def run(agent_class, prompt_cache: bool, order_service: OrderService):
+    prompts = []
+
+    def fake_llm(prompt_value):
+        prompts.append(prompt_value.to_messages())
+        return AIMessage(content="Sure, let me check that for you.")
+
+    registry = ServiceRegistry(llm=RunnableLambda(fake_llm), order_service=order_service,
+                               prompt_cache=prompt_cache)
+    agent = agent_class(registry=registry)
+    history = []
+    for question, order_id in TURNS:
+        history.append({"role": "user", "content": question})
+        response, _ = agent.process(question, "bench", order_id=order_id, history=list(history))
+        history.append({"role": "assistant", "content": response})
+
+    prefixes = {json.dumps(messages[0].content, sort_keys=True) for messages in prompts}
+    assert len(prefixes) == 1, f"{agent_class.__name__}: system prompt changed between turns"
+    prefix = agent.prompt_prefix
+    suffix_tokens = [estimate_tokens(agent._content_text(messages[-1].content)) for messages in prompts]
+    return estimate_tokens(prefix), suffix_tokens
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        order_service = OrderService(os.path.join(directory, "orders.json"))
+        print(f"{'agent':>20} {'cache':>6} {'prefix':>7}  suffix tokens per turn")
+        for agent_class in (OrderIssueAgent, LogisticsIssueAgent):
+            for prompt_cache in (False, True):
+                prefix_tokens, suffix_tokens = run(agent_class, prompt_cache, order_service)
+                print(f"{agent_class.__name__:>20} {str(prompt_cache):>6} {prefix_tokens:>7}  {suffix_tokens}")
+        order_service.close()
+    print("system prompts are byte-identical across turns")
@@ -0,0 +1,40 @@
+"""Compare the decision tree injected into the logistics prompt with the full tree.
+
+For a set of typical questions, prints the estimated prompt tokens of the
+relevant-branch rendering against the full SOP text and the time it takes to
+select the branches.
+
+Usage: python benchmarks/bench_sop_prompt.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.history import estimate_tokens
+from services.sop_service import SOPService
+
+QUESTIONS = [
+    "The courier tried to deliver twice but I wasn't home",
+    "My package is 10 days late and tracking hasn't moved",
+    "It says delivered but I never received it",
+    "Two items are missing from my combined package",
+    "Where do I pick up my parcel?",
+    "I need to change my delivery address",
+    "My package was returned to sender",
+    "Can you help me?",
+]
+
+if __name__ == "__main__":
+    tree = SOPService().logistics_tree
+    full_tokens = estimate_tokens(tree.text)
+    print(f"full tree: {full_tokens} tokens")
+    print(f"{'tokens':>7} {'saved':>6} {'select us':>10}  question")
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        for _ in range(1000):
+            text = tree.relevant_text(question)
+        elapsed_us = (time.perf_counter() - start) * 1e3
+        tokens = estimate_tokens(text)
+        print(f"{tokens:>7} {1 - tokens / full_tokens:>6.0%} {elapsed_us:>10.1f}  {question}")
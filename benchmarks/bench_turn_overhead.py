@@ -0,0 +1,95 @@
+"""Measure the per-turn overhead of the system outside the LLM call.
+
+Answers a stream of questions with a fake LLM that returns immediately (and
+the response cache disabled), so the time per turn is everything the system
+does around the model: entity extraction, history windowing and formatting,
+order lookup, prompt rendering and chain invocation. Also times the pieces
+that used to be rebuilt on every call against their prepared replacements.
+
+Usage: python benchmarks/bench_turn_overhead.py [turns]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from agents.entities import extract_entities
+from agents.history import HistoryFormatter, format_history
+from agents.logistics_issue_agent import LogisticsIssueAgent
+from customer_service import CustomerServiceSystem
+from services.order_service import OrderService
+from services.registry import ServiceRegistry
+from services.response_cache import ResponseCache
+
+QUESTIONS = [
+    "What's the status of my order 123?",
+    "I paid $250 for it and it still hasn't shipped",
+    "My package is late, I live in Dubai",
+    "Can I add a hat to order 789?",
+    "The courier tried to deliver but I wasn't home",
+]
+
+
+def per_call_us(function, repeat: int = 2000) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def turn_overhead(turns: int) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        fake_llm = RunnableLambda(lambda prompt_value: AIMessage(content="ORDER. Let me check that for you."))
+        registry = ServiceRegistry(llm=fake_llm, order_service=OrderService(os.path.join(directory, "orders.json")))
+        system = CustomerServiceSystem(registry=registry, response_cache=ResponseCache(max_entries=0))
+        sys.stdout = open(os.devnull, "w")
+        try:
+            start = time.perf_counter()
+            for turn in range(turns):
+                system.process_question(QUESTIONS[turn % len(QUESTIONS)], f"conversation-{turn % 20}")
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout.close()
+            sys.stdout = sys.__stdout__
+        registry.order_service.close()
+        return elapsed / turns * 1e6
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"per turn (fake LLM): {turn_overhead(turns):.0f} us")
+
+    question = QUESTIONS[2] + " and order 456 cost $80"
+    inline_regex = lambda: re.search(r'order\s+(?:id\s+)?(?:number\s+)?(?:#\s*)?(\d+)', question, re.IGNORECASE)
+    print(f"order id only, inline re.search: {per_call_us(inline_regex):.2f} us")
+    print(f"entity extraction (ids, amounts, regions): {per_call_us(lambda: extract_entities(question)):.2f} us")
+
+    with tempfile.TemporaryDirectory() as directory:
+        order_service = OrderService(os.path.join(directory, "orders.json"))
+        agent = LogisticsIssueAgent(registry=ServiceRegistry(llm=RunnableLambda(lambda prompt_value: AIMessage(content="")),
+                                                             order_service=order_service))
+        print(f"chain built per call: {per_call_us(lambda: agent.prompt | agent.llm):.2f} us")
+        order_service.close()
+
+    # Short customer questions, longer agent answers
+    history = [{"role": "user", "content": QUESTIONS[i % len(QUESTIONS)]} if i % 2 == 0 else
+               {"role": "assistant", "content": " ".join(QUESTIONS) * 2} for i in range(40)]
+    formatter = HistoryFormatter()
+
+    def sliding(format_window):
+        # Every turn adds two messages and the six-message window slides forward
+        for end in range(6, len(history) + 1, 2):
+            window = history[end - 6:end]
+            format_window(window)
+            format_window(window)  # the specialist formats the intent agent's window again
+
+    windows = (len(history) - 6) // 2 + 1
+    uncached = per_call_us(lambda: sliding(format_history), 500) / windows
+    cached = per_call_us(lambda: sliding(lambda window: formatter.format("bench", window)), 500) / windows
+    print(f"history formatting per turn: {uncached:.2f} us uncached, {cached:.2f} us with HistoryFormatter")
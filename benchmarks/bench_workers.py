@@ -0,0 +1,102 @@
+"""Load-test the multi-worker mode with a fake LLM.
+
+Each worker process builds a CustomerServiceSystem on shared state (SQLite
+conversations, file-locked order journal) and answers questions for a common
+set of conversations, so consecutive turns of a conversation land on different
+workers. Every tenth turn also updates an order address. The fake LLM waits
+``llm_ms`` per call, like a model endpoint would, so more workers can keep
+more calls in flight; with ``llm_ms`` 0 it answers instantly and the numbers
+show the per-turn overhead of the system itself, which only scales with the
+number of CPU cores.
+
+Usage: python benchmarks/bench_workers.py [turns_per_worker] [llm_ms]
+"""
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKER_COUNTS = [1, 2, 4, 8]
+CONVERSATIONS = 32
+QUESTIONS = [
+    "What's the status of my order 123?",
+    "I want to change the delivery address for order 456.",
+    "Where is my package? The tracking hasn't updated.",
+    "Can I cancel order 789?",
+]
+
+
+def build_system(directory: str, llm_seconds: float = 0.0):
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from customer_service import CustomerServiceSystem
+    from services.conversation_store import ConversationStore, SQLiteConversationBackend
+    from services.order_service import OrderService
+    from services.registry import ServiceRegistry
+    from services.response_cache import ResponseCache
+
+    def fake_llm(prompt_value):
+        time.sleep(llm_seconds)
+        # Parsed as ORDER by the intent agent, and a plain answer for the specialist
+        return AIMessage(content="ORDER. Thanks, I have looked into this for you.")
+
+    registry = ServiceRegistry(
+        llm=RunnableLambda(fake_llm),
+        order_service=OrderService(os.path.join(directory, "orders.json"), shared=True)
+    )
+    conversations = ConversationStore(
+        backend=SQLiteConversationBackend(os.path.join(directory, "conversations.db")), shared=True
+    )
+    # Without the response cache every turn that needs an LLM call makes one
+    return CustomerServiceSystem(registry=registry, conversations=conversations,
+                                 response_cache=ResponseCache(max_entries=0))
+
+
+def worker(directory: str, index: int, workers: int, turns: int, llm_seconds: float, start, done) -> None:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        system = build_system(directory, llm_seconds)
+        start.wait()
+        for turn in range(turns):
+            n = turn * workers + index
+            system.process_question(QUESTIONS[n % len(QUESTIONS)], f"conversation-{n % CONVERSATIONS}")
+            if turn % 10 == 0:
+                system.order_service.update_address("123", f"Address {index}-{turn}")
+        system.order_service.close()
+    done.put(index)
+
+
+def run(workers: int, turns: int, llm_seconds: float) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        build_system(directory).order_service.close()  # create the order data once
+        start = multiprocessing.Barrier(workers + 1)
+        done = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(directory, i, workers, turns, llm_seconds, start, done))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        start.wait()
+        began = time.perf_counter()
+        for _ in processes:
+            done.get()
+        elapsed = time.perf_counter() - began
+        for process in processes:
+            process.join()
+        return workers * turns / elapsed
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    llm_seconds = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 50.0 / 1e3
+    print(f"{os.cpu_count()} CPU cores, fake LLM latency {llm_seconds * 1e3:.0f} ms")
+    baseline = None
+    print(f"{'workers':>8} {'turns/s':>10} {'speedup':>8}")
+    for count in WORKER_COUNTS:
+        throughput = run(count, turns, llm_seconds)
+        baseline = baseline or throughput
+        print(f"{count:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
@@ -1,12 +1,18 @@
-from typing import Dict, Any
-from main import CustomerServiceSystem
+from typing import Dict, Any, Iterator
+from urllib.parse import parse_qs, urlsplit
+from customer_service import CustomerServiceSystem, get_system
+from services.order_service import MAX_ORDERS_PER_CALL, JournalSyncError, VersionConflictError
 
 class CustomerServiceMCP:
-    """MCP server configuration for the customer service system."""
+    """MCP server configuration for the customer service system.
     
-    def __init__(self):
-        self.system = CustomerServiceSystem()
-        self.conversations = {}
+    Handlers use the process-wide system from ``get_system()``, which is only
+    created when a handler first needs it and is shared with the FastMCP server.
+    """
+    
+    @property
+    def system(self) -> CustomerServiceSystem:
+        return get_system()
     
     def get_tools(self) -> Dict[str, Dict[str, Any]]:
         """Define the tools provided by this MCP server."""
@@ -42,6 +48,68 @@ class CustomerServiceMCP:
                     }
                 },
                 "handler": self.handle_process_question
+            },
+            "get_orders": {
+                "description": "Get information about several orders in one call",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "order_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "The IDs of the orders to look up"
+                        }
+                    },
+                    "required": ["order_ids"]
+                },
+                "handler": self.handle_get_orders
+            },
+            "list_orders": {
+                "description": "List orders page by page, optionally filtered by status",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "status": {
+                            "type": "string",
+                            "description": "Only list orders with this status",
+                            "optional": True
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "next_cursor returned with the previous page",
+                            "optional": True
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of orders per page (default 100)",
+                            "optional": True
+                        }
+                    }
+                },
+                "handler": self.handle_list_orders
+            },
+            "update_order_addresses": {
+                "description": "Atomically update the delivery addresses of several orders",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "updates": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "order_id": {"type": "string"},
+                                    "new_address": {"type": "string"},
+                                    "expected_version": {"type": "integer", "optional": True}
+                                },
+                                "required": ["order_id", "new_address"]
+                            },
+                            "description": "One update per order"
+                        }
+                    },
+                    "required": ["updates"]
+                },
+                "handler": self.handle_update_order_addresses
             }
         }
     
@@ -52,6 +120,10 @@ class CustomerServiceMCP:
                 "description": "Access to order data",
                 "handler": self.handle_order_data_access
             },
+            "order_data_ndjson": {
+                "description": "All orders as newline-delimited JSON, streamed page by page",
+                "handler": self.stream_order_data
+            },
             "sop_data": {
                 "description": "Access to Standard Operating Procedures",
                 "handler": self.handle_sop_data_access
@@ -70,10 +142,76 @@ class CustomerServiceMCP:
             "conversation_id": new_conversation_id
         }
     
+    def handle_get_orders(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the get_orders tool."""
+        order_ids = args["order_ids"]
+        if len(order_ids) > MAX_ORDERS_PER_CALL:
+            return {"error": f"At most {MAX_ORDERS_PER_CALL} orders per call", "order_ids": order_ids}
+        order_service = self.system.order_service
+        orders = order_service.get_orders(order_ids)
+        return {
+            "orders": list(orders.values()),
+            "versions": order_service.get_order_versions(list(orders)),
+            "not_found": [order_id for order_id in order_ids if order_id not in orders]
+        }
+    
+    def handle_list_orders(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the list_orders tool."""
+        try:
+            orders, next_cursor = self.system.order_service.list_orders(
+                status=args.get("status"), cursor=args.get("cursor"),
+                limit=min(args.get("limit", 100), MAX_ORDERS_PER_CALL)
+            )
+        except ValueError as e:
+            return {"error": str(e)}
+        return {"orders": orders, "next_cursor": next_cursor}
+    
+    def handle_update_order_addresses(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the update_order_addresses tool."""
+        updates = args["updates"]
+        if len(updates) > MAX_ORDERS_PER_CALL:
+            return {"error": f"At most {MAX_ORDERS_PER_CALL} orders per call"}
+        order_ids = [update["order_id"] for update in updates]
+        order_service = self.system.order_service
+        try:
+            success = order_service.update_addresses(updates)
+        except VersionConflictError as e:
+            return {"error": f"{str(e)}; no order was changed", "order_id": e.order_id,
+                    "current_version": e.current_version}
+        except JournalSyncError as e:
+            return {"error": str(e), "order_ids": e.order_ids}
+        except ValueError as e:
+            return {"error": str(e)}
+        if success:
+            return {
+                "orders": list(order_service.get_orders(order_ids).values()),
+                "versions": order_service.get_order_versions(order_ids)
+            }
+        existing = order_service.get_orders(order_ids)
+        return {
+            "error": "Failed to update addresses; no order was changed",
+            "not_found": [order_id for order_id in order_ids if order_id not in existing]
+        }
+    
     def handle_order_data_access(self, uri: str) -> Dict[str, Any]:
-        """Handle access to order data."""
+        """Handle access to order data.
+        
+        "all" returns every order at once. "all?limit=100" returns the first
+        page instead, with a next_cursor to pass as "all?cursor=...&limit=100"
+        for the next one; "status=..." filters the pages.
+        """
         if uri == "all":
             return {"orders": self.system.order_service.get_order_data()}
+        if uri.startswith("all?"):
+            query = {key: values[-1] for key, values in parse_qs(urlsplit(uri).query).items()}
+            try:
+                orders, next_cursor = self.system.order_service.list_orders(
+                    status=query.get("status"), cursor=query.get("cursor"),
+                    limit=min(int(query.get("limit", 100)), MAX_ORDERS_PER_CALL)
+                )
+            except ValueError as e:
+                return {"error": str(e)}
+            return {"orders": orders, "next_cursor": next_cursor}
         
         order_id = uri
         order_info = self.system.order_service.get_order_info(order_id)
@@ -81,6 +219,20 @@ class CustomerServiceMCP:
             return {"order": order_info}
         return {"error": f"Order {order_id} not found"}
     
+    def stream_order_data(self, uri: str = "all") -> Iterator[str]:
+        """Stream orders as NDJSON lines.
+        
+        Takes the same URIs as order_data: "all" streams every order and
+        "all?status=..." only those with that status.
+        """
+        if uri == "all":
+            status = None
+        elif uri.startswith("all?"):
+            status = parse_qs(urlsplit(uri).query).get("status", [None])[-1]
+        else:
+            raise ValueError(f"Unknown order data URI: {uri}")
+        return self.system.order_service.export_ndjson(status=status)
+    
     def handle_sop_data_access(self, uri: str) -> Dict[str, Any]:
         """Handle access to SOP data."""
         if uri == "order":
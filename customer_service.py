@@ -0,0 +1,426 @@
+import os
+import threading
+import time
+import uuid
+import asyncio
+from typing import AsyncIterator, Callable, Optional, Dict, Any
+from agents.base_agent import BaseAgent
+from agents.entities import Entities, extract_entities
+from agents.history import HistoryWindow
+from agents.intent_recognition_agent import IntentRecognitionAgent
+from agents.order_issue_agent import OrderIssueAgent
+from agents.logistics_issue_agent import LogisticsIssueAgent
+from services.order_service import OrderService
+from services.registry import ServiceRegistry, DEFAULT_MODEL_ID, DEFAULT_REGION
+from services.response_cache import ResponseCache
+from services.conversation_store import ConversationStore, SQLiteConversationBackend
+from services.text_chunker import SentenceChunker, split_sentences
+
+UNKNOWN_INTENT_RESPONSE = "I'm not sure if your question is about an order or logistics issue. Could you please provide more details?"
+
+class CustomerServiceSystem:
+    """Main customer service system that coordinates agents and services."""
+    
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, region: str = DEFAULT_REGION,
+                 registry: Optional[ServiceRegistry] = None,
+                 conversations: Optional[ConversationStore] = None,
+                 history_window: Optional[HistoryWindow] = None,
+                 speculative: bool = False,
+                 response_cache: Optional[ResponseCache] = None):
+        """Initialize the customer service system with its agents and services.
+        
+        All agents share a single registry, i.e. one Bedrock client, one order
+        index and one SOP service. Conversations are kept in a bounded store, and
+        the history sent to the agents is limited by a rolling window. With
+        speculative=True, aprocess_question() overlaps the intent call with the
+        specialist chosen on the previous turn. Responses to the first question
+        of a conversation are cached and reused while the order and SOPs are unchanged.
+        """
+        self.registry = registry or ServiceRegistry(model_id=model_id, region=region)
+        self.intent_agent = IntentRecognitionAgent(registry=self.registry)
+        self.order_agent = OrderIssueAgent(registry=self.registry)
+        self.logistics_agent = LogisticsIssueAgent(registry=self.registry)
+        
+        self.order_service = self.registry.order_service
+        self.sop_service = self.registry.sop_service
+        
+        self.conversations = conversations or ConversationStore()
+        self.history_window = history_window or HistoryWindow()
+        self.speculative = speculative
+        self._speculation_stats = {"hits": 0, "misses": 0}
+        
+        self.response_cache = response_cache or ResponseCache()
+        self.order_service.add_update_listener(self.response_cache.invalidate_order)
+    
+    def _open_conversation(self, conversation_id: Optional[str]) -> tuple[str, Dict[str, Any]]:
+        """Load (or create) the conversation state, which may read the conversation database."""
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+        return conversation_id, self.conversations.get_or_create(conversation_id)
+    
+    def _record_question(self, user_question: str, conversation: Dict[str, Any]) -> Entities:
+        """Record the user's message and return the entities it mentions."""
+        conversation["history"].append({"role": "user", "content": user_question})
+        
+        entities = extract_entities(user_question)
+        if entities.order_id:
+            conversation["order_id"] = entities.order_id
+        
+        return entities
+    
+    def _start_turn(self, user_question: str,
+                    conversation_id: Optional[str]) -> tuple[str, Dict[str, Any], Entities]:
+        """Record the user's message and return the conversation state and the entities it mentions."""
+        conversation_id, conversation = self._open_conversation(conversation_id)
+        return conversation_id, conversation, self._record_question(user_question, conversation)
+    
+    async def _astart_turn(self, user_question: str,
+                           conversation_id: Optional[str]) -> tuple[str, Dict[str, Any], Entities]:
+        """_start_turn() for the async paths, loading the conversation in a worker thread.
+        
+        The message is recorded on the event loop, so a turn cancelled while
+        the conversation loads leaves it untouched.
+        """
+        conversation_id, conversation = await asyncio.to_thread(self._open_conversation, conversation_id)
+        return conversation_id, conversation, self._record_question(user_question, conversation)
+    
+    def _prompt_history(self, conversation: Dict[str, Any]) -> Dict[str, Any]:
+        """Windowed history arguments for the agents."""
+        recent, summary = self.history_window.update(conversation)
+        return {"history": recent, "summary": summary}
+    
+    def _finish_turn(self, conversation_id: str, conversation: Dict[str, Any], response: str) -> None:
+        """Record the assistant's response and save the conversation."""
+        conversation["history"].append({"role": "assistant", "content": response})
+        self.conversations.save(conversation_id, conversation)
+    
+    async def _afinish_turn(self, conversation_id: str, conversation: Dict[str, Any], response: str) -> None:
+        """_finish_turn() for the async paths, saving the conversation in a worker thread."""
+        conversation["history"].append({"role": "assistant", "content": response})
+        await asyncio.to_thread(self.conversations.save, conversation_id, conversation)
+    
+    def _abort_turn(self, conversation: Dict[str, Any], user_question: str) -> None:
+        """Take back the user's message of a turn that failed or was cancelled.
+        
+        Otherwise the next turn would follow an unanswered question, and the
+        history would no longer alternate between user and assistant.
+        """
+        history = conversation["history"]
+        if history and history[-1] == {"role": "user", "content": user_question}:
+            history.pop()
+    
+    def _response_cache_context(self, conversation: Dict[str, Any],
+                                prompt_history: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Order and SOP state a cached response for this turn depends on.
+        
+        Only the first turn of a conversation is cacheable: later answers also
+        depend on the history sent with the prompt, which is not part of the
+        cache key. Returns None otherwise.
+        """
+        if not self.response_cache.enabled:
+            return None
+        if len(prompt_history["history"]) > 1 or prompt_history["summary"]:
+            return None
+        order_id = conversation.get("order_id")
+        return {
+            "order": self.order_service.get_order_info(order_id) if order_id else None,
+            "sop_version": self.sop_service.version
+        }
+    
+    def _cached_response(self, user_question: str, intent: str,
+                         cache_context: Optional[Dict[str, Any]]) -> Optional[str]:
+        if cache_context is None:
+            return None
+        return self.response_cache.get(user_question, intent, **cache_context)
+    
+    def _cache_response(self, user_question: str, intent: str, cache_context: Optional[Dict[str, Any]],
+                        response: str, started: float) -> None:
+        """Cache a generated response along with the time it took to generate."""
+        if cache_context is not None:
+            self.response_cache.put(user_question, intent, response=response,
+                                    latency=time.perf_counter() - started, **cache_context)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Runtime metrics for monitoring."""
+        return {
+            "intent": self.intent_agent.get_stats(),
+            "speculation": dict(self._speculation_stats),
+            "response_cache": self.response_cache.get_stats()
+        }
+    
+    def _get_agent(self, intent: str) -> Optional[BaseAgent]:
+        """Return the specialist agent responsible for an intent, if any."""
+        if intent == "ORDER":
+            return self.order_agent
+        elif intent == "LOGISTICS":
+            return self.logistics_agent
+        return None
+    
+    def process_question(self, user_question: str, conversation_id: Optional[str] = None) -> tuple[str, str]:
+        """Process a customer question through the multi-agent system."""
+        conversation_id, conversation, entities = self._start_turn(user_question, conversation_id)
+        try:
+            prompt_history = self._prompt_history(conversation)
+            cache_context = self._response_cache_context(conversation, prompt_history)
+            
+            intent, _ = self.intent_agent.process(
+                user_question,
+                conversation_id,
+                **prompt_history
+            )
+            print(f"Intent recognized: {intent}")
+            
+            agent = self._get_agent(intent)
+            if agent:
+                response = self._cached_response(user_question, intent, cache_context)
+                if response is None:
+                    started = time.perf_counter()
+                    response, _ = agent.process(
+                        user_question,
+                        conversation_id,
+                        order_id=conversation.get("order_id"),
+                        entities=entities,
+                        **prompt_history
+                    )
+                    self._cache_response(user_question, intent, cache_context, response, started)
+                conversation["last_intent"] = intent
+            else:
+                response = UNKNOWN_INTENT_RESPONSE
+            
+            self._finish_turn(conversation_id, conversation, response)
+            
+            return response, conversation_id
+        except BaseException:
+            self._abort_turn(conversation, user_question)
+            raise
+    
+    async def _arun_agent(self, agent: BaseAgent, user_question: str, conversation_id: str,
+                          conversation: Dict[str, Any], prompt_history: Dict[str, Any],
+                          entities: Entities) -> str:
+        response, _ = await agent.aprocess(
+            user_question,
+            conversation_id,
+            order_id=conversation.get("order_id"),
+            entities=entities,
+            **prompt_history
+        )
+        return response
+    
+    async def _arecognize_speculatively(self, user_question: str, conversation_id: str,
+                                        conversation: Dict[str, Any], prompt_history: Dict[str, Any],
+                                        entities: Entities) -> tuple[str, Optional[asyncio.Task]]:
+        """Recognize the intent, speculatively starting the likely specialist in parallel.
+        
+        The specialist used for the conversation's previous turn is started at the
+        same time as the intent LLM call. If the recognized intent matches, its
+        already running task is returned; otherwise it is cancelled and None is
+        returned in its place.
+        """
+        guess = conversation.get("last_intent")
+        guess_agent = self._get_agent(guess) if guess else None
+        if not guess_agent:
+            intent, _ = await self.intent_agent.aprocess(user_question, conversation_id, **prompt_history)
+            return intent, None
+        
+        speculative_task = asyncio.create_task(
+            self._arun_agent(guess_agent, user_question, conversation_id, conversation, prompt_history, entities)
+        )
+        try:
+            intent, _ = await self.intent_agent.aprocess(user_question, conversation_id, **prompt_history)
+        except BaseException:
+            speculative_task.cancel()
+            raise
+        
+        if intent == guess:
+            self._speculation_stats["hits"] += 1
+            return intent, speculative_task
+        
+        self._speculation_stats["misses"] += 1
+        speculative_task.cancel()
+        return intent, None
+    
+    async def aprocess_question(self, user_question: str, conversation_id: Optional[str] = None) -> tuple[str, str]:
+        """Asynchronous variant of process_question() that never blocks the event loop.
+        
+        The intent and specialist chains are awaited instead of invoked, so many
+        conversations can be served concurrently from a single event loop. In
+        speculative mode the intent LLM call and the likely specialist run in
+        parallel (see _arecognize_speculatively).
+        """
+        conversation_id, conversation, entities = await self._astart_turn(user_question, conversation_id)
+        try:
+            prompt_history = self._prompt_history(conversation)
+            cache_context = await asyncio.to_thread(self._response_cache_context, conversation, prompt_history)
+            
+            speculative_task = None
+            intent = self.intent_agent.classify_locally(user_question)
+            if intent is None:
+                if self.speculative:
+                    # The speculative specialist starts together with the intent call
+                    started = time.perf_counter()
+                    intent, speculative_task = await self._arecognize_speculatively(
+                        user_question, conversation_id, conversation, prompt_history, entities
+                    )
+                else:
+                    intent, _ = await self.intent_agent.aprocess(
+                        user_question,
+                        conversation_id,
+                        **prompt_history
+                    )
+            print(f"Intent recognized: {intent}")
+            
+            agent = self._get_agent(intent)
+            # With a rule-based intent, a cached response skips every LLM call
+            response = self._cached_response(user_question, intent, cache_context) if agent else None
+            if not speculative_task:
+                started = time.perf_counter()
+            if response is not None:
+                if speculative_task:
+                    speculative_task.cancel()
+            elif speculative_task:
+                response = await speculative_task
+                self._cache_response(user_question, intent, cache_context, response, started)
+            elif agent:
+                response = await self._arun_agent(agent, user_question, conversation_id, conversation,
+                                                  prompt_history, entities)
+                self._cache_response(user_question, intent, cache_context, response, started)
+            else:
+                response = UNKNOWN_INTENT_RESPONSE
+            
+            if agent:
+                conversation["last_intent"] = intent
+            
+            await self._afinish_turn(conversation_id, conversation, response)
+            
+            return response, conversation_id
+        except BaseException:
+            self._abort_turn(conversation, user_question)
+            raise
+    
+    async def astream_question(self, user_question: str, conversation_id: str,
+                               on_response: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+        """Stream the response to a customer question sentence by sentence.
+        
+        The intent is recognized first; the specialist agent's output is then
+        regrouped into complete sentences and yielded as soon as each one is
+        finished. The full response is recorded in the conversation at the end
+        and, if given, passed to ``on_response``; it keeps the whitespace the
+        sentences were split at.
+        """
+        conversation_id, conversation, entities = await self._astart_turn(user_question, conversation_id)
+        try:
+            prompt_history = self._prompt_history(conversation)
+            cache_context = await asyncio.to_thread(self._response_cache_context, conversation, prompt_history)
+            
+            intent, _ = await self.intent_agent.aprocess(
+                user_question,
+                conversation_id,
+                **prompt_history
+            )
+            print(f"Intent recognized: {intent}")
+            
+            agent = self._get_agent(intent)
+            if not agent:
+                yield UNKNOWN_INTENT_RESPONSE
+                if on_response:
+                    on_response(UNKNOWN_INTENT_RESPONSE)
+                await self._afinish_turn(conversation_id, conversation, UNKNOWN_INTENT_RESPONSE)
+                return
+            
+            cached = self._cached_response(user_question, intent, cache_context)
+            if cached is not None:
+                for sentence in split_sentences(cached):
+                    yield sentence
+                conversation["last_intent"] = intent
+                if on_response:
+                    on_response(cached)
+                await self._afinish_turn(conversation_id, conversation, cached)
+                return
+            
+            started = time.perf_counter()
+            chunker = SentenceChunker()
+            parts = []
+            async for token in agent.astream(
+                user_question,
+                conversation_id,
+                order_id=conversation.get("order_id"),
+                entities=entities,
+                **prompt_history
+            ):
+                parts.append(token)
+                for sentence in chunker.feed(token):
+                    yield sentence
+            remainder = chunker.flush()
+            if remainder:
+                yield remainder
+            
+            response = "".join(parts).strip()
+            self._cache_response(user_question, intent, cache_context, response, started)
+            conversation["last_intent"] = intent
+            if on_response:
+                on_response(response)
+            await self._afinish_turn(conversation_id, conversation, response)
+        except BaseException:
+            self._abort_turn(conversation, user_question)
+            raise
+
+_system: Optional[CustomerServiceSystem] = None
+_system_lock = threading.Lock()
+
+def shared_state_enabled() -> bool:
+    """Whether several worker processes serve the same state (CS_SHARED_STATE=1)."""
+    return os.getenv("CS_SHARED_STATE", "0") == "1"
+
+def create_conversation_store() -> ConversationStore:
+    """Build the conversation store configured by the environment.
+    
+    Memory is bounded by CS_MAX_CONVERSATIONS and CS_CONVERSATION_TTL_SECONDS;
+    with CS_CONVERSATION_DB set, conversations are also persisted to SQLite so
+    evicted ones can be picked up again on their next turn. With shared state
+    the SQLite database is always used and read on every turn.
+    """
+    shared = shared_state_enabled()
+    conversation_db = os.getenv("CS_CONVERSATION_DB") or ("conversations.db" if shared else None)
+    return ConversationStore(
+        max_entries=int(os.getenv("CS_MAX_CONVERSATIONS", "1000")),
+        ttl_seconds=float(os.getenv("CS_CONVERSATION_TTL_SECONDS", "1800")),
+        backend=SQLiteConversationBackend(conversation_db) if conversation_db else None,
+        shared=shared
+    )
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache configured by the environment.
+    
+    CS_RESPONSE_CACHE_SIZE bounds the number of cached responses (0 disables
+    the cache), CS_RESPONSE_CACHE_TTL_SECONDS sets how long they are reused,
+    and CS_RESPONSE_CACHE_SIMILARITY enables near-duplicate matching above
+    the given word overlap (0-1).
+    """
+    similarity = os.getenv("CS_RESPONSE_CACHE_SIMILARITY")
+    return ResponseCache(
+        max_entries=int(os.getenv("CS_RESPONSE_CACHE_SIZE", "1000")),
+        ttl_seconds=float(os.getenv("CS_RESPONSE_CACHE_TTL_SECONDS", "3600")),
+        similarity_threshold=float(similarity) if similarity else None
+    )
+
+def get_system() -> CustomerServiceSystem:
+    """Return the process-wide customer service system, creating it on first use.
+    
+    The MCP server and the MCP config handlers share this instance, so the LLM
+    client, order service and conversation store exist once per process.
+    """
+    global _system
+    if _system is None:
+        with _system_lock:
+            if _system is None:
+                registry = ServiceRegistry(
+                    order_service=OrderService(shared=True) if shared_state_enabled() else None,
+                    prompt_cache=os.getenv("CS_PROMPT_CACHE", "0") == "1"
+                )
+                _system = CustomerServiceSystem(
+                    registry=registry,
+                    conversations=create_conversation_store(),
+                    speculative=os.getenv("CS_SPECULATIVE", "0") == "1",
+                    response_cache=create_response_cache()
+                )
+    return _system
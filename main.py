@@ -1,50 +1,82 @@
-import uuid
 import json
 import asyncio
-import aioconsole
-import boto3
 import os
-import pyaudio
-import wave
 import time
-import requests
-import pygame
+import io
 import tempfile
 import subprocess
 import platform
 import threading
 import sys
 import select
-from typing import Optional, Dict, Any
-from langchain_aws import ChatBedrock
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from agents.intent_recognition_agent import IntentRecognitionAgent
-from agents.order_issue_agent import OrderIssueAgent
-from agents.logistics_issue_agent import LogisticsIssueAgent
-from services.order_service import OrderService
-from services.sop_service import SOPService
-from amazon_transcribe.client import TranscribeStreamingClient
-from amazon_transcribe.handlers import TranscriptResultStreamHandler
-from amazon_transcribe.model import TranscriptEvent
-import aiofile
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Any
+from customer_service import UNKNOWN_INTENT_RESPONSE
+from services.text_chunker import split_sentences
+from services.tts_cache import TTSCache
+from services.voice_activity import EnergyVAD
+
+# 语音相关的依赖（pyaudio、pygame、amazon_transcribe、boto3等）在首次使用时才导入，
+# 使只需要核心系统的进程（如MCP服务器）无需安装音频库，启动也更快
 
 # AWS Configuration
 S3_BUCKET = 'a-web-uw2'
 
-# Initialize AWS clients
-transcribe_client = boto3.client('transcribe')
-polly_client = boto3.client('polly')
-s3_client = boto3.client('s3')
+# AWS clients are created on first use
+_polly_client = None
+_polly_client_lock = threading.Lock()
+
+def get_polly_client():
+    """
+    Return the shared Polly client, creating it on first use.
+    """
+    global _polly_client
+    if _polly_client is None:
+        with _polly_client_lock:
+            if _polly_client is None:
+                import boto3
+                _polly_client = boto3.client('polly')
+    return _polly_client
+
+# 本地语音活动检测（VAD），在本地判定说话结束
+LOCAL_VAD = os.getenv("CS_LOCAL_VAD", "1") == "1"
+
+# 流水线语音合成：按句合成，边合成边播放
+TTS_PIPELINE = os.getenv("CS_TTS_PIPELINE", "1") == "1"
+TTS_LOOKAHEAD = int(os.getenv("CS_TTS_LOOKAHEAD", "2"))  # 最多提前合成的句数
+TTS_MIN_SEGMENT_CHARS = 40  # 短于该长度的句子与下一句合并
+TTS_FORMAT = os.getenv("CS_TTS_FORMAT", "mp3").lower()  # mp3 或 pcm（流式播放）
+TTS_PCM_SAMPLE_RATE = 16000
+TTS_PCM_CHUNK_BYTES = 3200  # 100ms的16位单声道音频
+TTS_VOICE_ID = 'Joanna'
+
+# 语音缓存：按文本、音色和格式缓存合成结果，可选磁盘缓存
+tts_cache = TTSCache(
+    max_bytes=int(os.getenv("CS_TTS_CACHE_MB", "32")) * 1024 * 1024,
+    cache_dir=os.getenv("CS_TTS_CACHE_DIR") or None
+)
+
+# 启动时预先合成到磁盘缓存的固定话术：澄清提示及SOP中的标准补偿方案
+TTS_PREWARM_PHRASES = [
+    UNKNOWN_INTENT_RESPONSE,
+    "Could you please provide your order number?",
+    "Could you please confirm your shipping address?",
+    "We'd like to offer you 100 points as compensation for the delay.",
+    "We can offer you a 100% store credit.",
+    "We can offer you a 50% store credit.",
+    "We can resend your order or give you a 100% cash refund.",
+]
 
 # 全局变量控制播放状态
 audio_playing = False
 audio_interrupted = False
 
-class DynamicEventHandler(TranscriptResultStreamHandler):
+class DynamicEventHandler:
     """改进的事件处理器，支持动态语音结束检测"""
     
     def __init__(self, transcript_result_stream):
-        super().__init__(transcript_result_stream)
+        self._transcript_result_stream = transcript_result_stream
         self.final_transcript = ""
         self.partial_transcript = ""
         self.speech_ended = False
@@ -53,8 +85,19 @@ class DynamicEventHandler(TranscriptResultStreamHandler):
         self.min_speech_duration = 0.5  # 最小语音时长
         self.speech_start_time = None
         self.has_speech = False
+        self.last_speech_time = None  # 最后一次转录文本发生变化的时间
+        self.end_time = None  # 判定语音结束的时间
+        self.final_time = None  # 收到最终转录结果的时间
+
+    async def handle_events(self):
+        """读取转录结果流，把转录事件交给handle_transcript_event处理"""
+        from amazon_transcribe.model import TranscriptEvent
 
-    async def handle_transcript_event(self, transcript_event: TranscriptEvent):
+        async for event in self._transcript_result_stream:
+            if isinstance(event, TranscriptEvent):
+                await self.handle_transcript_event(event)
+
+    async def handle_transcript_event(self, transcript_event):
         """处理转录事件，实现动态结束检测"""
         results = transcript_event.transcript.results
         current_time = time.time()
@@ -66,6 +109,8 @@ class DynamicEventHandler(TranscriptResultStreamHandler):
                 if result.is_partial:
                     # 处理部分结果
                     if transcript_text:
+                        if transcript_text != self.partial_transcript:
+                            self.last_speech_time = current_time
                         self.partial_transcript = transcript_text
                         self.last_partial_time = current_time
                         if not self.has_speech:
@@ -76,12 +121,14 @@ class DynamicEventHandler(TranscriptResultStreamHandler):
                     # 处理完整结果
                     if transcript_text:
                         self.final_transcript = transcript_text
+                        self.final_time = current_time
                         print(f"✅ 识别完成: {transcript_text}")
                         
                         # 检查是否满足最小语音时长
                         if (self.speech_start_time and 
                             current_time - self.speech_start_time >= self.min_speech_duration):
                             self.speech_ended = True
+                            self.end_time = current_time
                             return
         
         # 检查静音超时
@@ -89,9 +136,13 @@ class DynamicEventHandler(TranscriptResultStreamHandler):
             current_time - self.last_partial_time > self.silence_threshold):
             print("🔇 检测到静音，结束录制")
             self.speech_ended = True
+            self.end_time = current_time
 
 async def stream_audio_to_text_dynamic():
     """动态语音转文本，基于Amazon Transcribe内置端点检测"""
+    import pyaudio
+    from amazon_transcribe.client import TranscribeStreamingClient
+
     client = TranscribeStreamingClient(region="us-west-2")
 
     # 启用部分结果稳定化和端点检测
@@ -103,24 +154,39 @@ async def stream_audio_to_text_dynamic():
         partial_results_stability="high"
     )
 
+    capture_stats = {"chunks": 0, "bytes": 0, "max_queue": 0}
+    # 本地语音活动检测：不上传静音帧，检测到尾部静音后立即结束音频流
+    vad = EnergyVAD() if LOCAL_VAD else None
+
     async def write_chunks():
-        CHUNK = 320  # 20ms音频块，适合VAD检测
+        CHUNK = 1600  # 每次回调100ms音频块
+        MAX_BATCH_BYTES = 6400  # 积压时合并发送，最多200ms
         FORMAT = pyaudio.paInt16
         CHANNELS = 1
         RATE = 16000
         MAX_RECORD_SECONDS = 30  # 最大录制时长保护
 
+        loop = asyncio.get_running_loop()
+        audio_queue: asyncio.Queue = asyncio.Queue()
+
+        def on_audio(in_data, frame_count, time_info, status):
+            """PyAudio回调线程：把采集到的音频交给事件循环，不阻塞采集"""
+            loop.call_soon_threadsafe(audio_queue.put_nowait, in_data)
+            return (None, pyaudio.paContinue)
+
         p = pyaudio.PyAudio()
         audio_stream = p.open(format=FORMAT,
                         channels=CHANNELS,
                         rate=RATE,
                         input=True,
-                        frames_per_buffer=CHUNK)
+                        frames_per_buffer=CHUNK,
+                        stream_callback=on_audio)
 
         print("🎤 开始录音，请说话...")
         print("💡 系统会自动检测语音结束")
         
         start_time = time.time()
+        audio_stream.start_stream()
         
         try:
             while not handler.speech_ended:
@@ -130,9 +196,31 @@ async def stream_audio_to_text_dynamic():
                     break
                 
                 try:
-                    data = audio_stream.read(CHUNK, exception_on_overflow=False)
-                    await stream.input_stream.send_audio_event(audio_chunk=data)
-                    await asyncio.sleep(0.02)  # 20ms间隔
+                    data = await asyncio.wait_for(audio_queue.get(), timeout=0.2)
+                except asyncio.TimeoutError:
+                    continue
+                
+                try:
+                    # 合并积压的音频块，减少发送次数
+                    capture_stats["max_queue"] = max(capture_stats["max_queue"], audio_queue.qsize())
+                    while len(data) < MAX_BATCH_BYTES and not audio_queue.empty():
+                        data += audio_queue.get_nowait()
+                    
+                    speech_ended = False
+                    if vad:
+                        data, speech_ended = vad.process(data)
+                    if data:
+                        await stream.input_stream.send_audio_event(audio_chunk=data)
+                        capture_stats["chunks"] += 1
+                        capture_stats["bytes"] += len(data)
+                    if speech_ended:
+                        if not (handler.has_speech or handler.final_transcript):
+                            # 尚未识别出任何文字（如咳嗽等噪音），继续等待说话
+                            vad.reset()
+                            continue
+                        print("🔇 本地检测到语音结束")
+                        handler.end_time = time.time()
+                        break
                 except Exception as e:
                     print(f"录音错误: {e}")
                     break
@@ -149,27 +237,233 @@ async def stream_audio_to_text_dynamic():
     # 并行执行音频写入和事件处理
     await asyncio.gather(write_chunks(), handler.handle_events())
     
+    # 时延统计：最后一次识别到语音内容到判定结束、再到得到最终结果的时间
+    if handler.last_speech_time and handler.end_time:
+        transcript_time = handler.final_time or handler.end_time
+        print(f"⏱️ 语音结束到判定结束: {(handler.end_time - handler.last_speech_time) * 1000:.0f} ms，"
+              f"到转录完成: {(transcript_time - handler.last_speech_time) * 1000:.0f} ms"
+              f"（发送 {capture_stats['chunks']} 块 / {capture_stats['bytes'] // 32} ms 音频，"
+              f"最大积压 {capture_stats['max_queue']} 块）")
+    if vad:
+        print(f"📉 本地VAD跳过静音帧: {vad.frames_total - vad.frames_sent}/{vad.frames_total}")
+    
     # 返回最终或部分转录结果
     final_result = handler.final_transcript if handler.final_transcript else handler.partial_transcript
     return final_result.strip()
 
+class CachedAudioStream:
+    """
+    为缓存中的音频提供与Polly AudioStream相同的分块读取接口
+    """
+    
+    def __init__(self, audio_data: bytes):
+        self._buffer = io.BytesIO(audio_data)
+    
+    def iter_chunks(self, chunk_size: int = 1024) -> Iterator[bytes]:
+        return iter(lambda: self._buffer.read(chunk_size), b"")
+    
+    def close(self) -> None:
+        self._buffer.close()
+
+class CachingAudioStream:
+    """
+    包装Polly的AudioStream，边读取边保存，完整读完后写入语音缓存
+    """
+    
+    def __init__(self, stream, on_complete: Callable[[bytes], None]):
+        self._stream = stream
+        self._on_complete = on_complete
+    
+    def iter_chunks(self, chunk_size: int = 1024) -> Iterator[bytes]:
+        parts = []
+        for chunk in self._stream.iter_chunks(chunk_size=chunk_size):
+            parts.append(chunk)
+            yield chunk
+        # 只缓存完整的音频（被打断的播放不会走到这里）
+        self._on_complete(b"".join(parts))
+    
+    def close(self) -> None:
+        self._stream.close()
+
+def _polly_synthesize(text: str, output_format: str):
+    """
+    Call AWS Polly and return the (not yet downloaded) audio stream.
+    """
+    kwargs = {"SampleRate": str(TTS_PCM_SAMPLE_RATE)} if output_format == 'pcm' else {}
+    response = get_polly_client().synthesize_speech(
+        Text=text,
+        OutputFormat=output_format,
+        VoiceId=TTS_VOICE_ID,
+        **kwargs
+    )
+    
+    return response['AudioStream']
+
 def synthesize_speech(text: str) -> bytes:
     """
     Convert text to speech using AWS Polly and return the audio data.
+    Repeated phrases are served from the TTS cache without calling Polly.
     """
-    response = polly_client.synthesize_speech(
-        Text=text,
-        OutputFormat='mp3',
-        VoiceId='Joanna'
+    return tts_cache.get_or_synthesize(
+        text, TTS_VOICE_ID, 'mp3', lambda phrase: _polly_synthesize(phrase, 'mp3').read()
     )
+
+def synthesize_speech_stream(text: str):
+    """
+    Convert text to speech using AWS Polly and return the raw PCM audio stream
+    without waiting for it to download, so playback can start on the first bytes.
+    Cached phrases are replayed from memory; new ones are cached once fully played.
+    """
+    cached = tts_cache.get(text, TTS_VOICE_ID, 'pcm')
+    if cached is not None:
+        return CachedAudioStream(cached)
     
-    return response['AudioStream'].read()
+    return CachingAudioStream(
+        _polly_synthesize(text, 'pcm'),
+        lambda audio_data: tts_cache.put(text, TTS_VOICE_ID, 'pcm', audio_data)
+    )
+
+def prewarm_tts_cache() -> None:
+    """
+    预先合成固定话术（整句及流水线模式下的分句），使其首次播放即可命中缓存。
+    只在配置了磁盘缓存时进行，且只合成磁盘上还没有的话术；
+    仅有内存缓存时每次启动都要重新调用Polly，得不偿失
+    """
+    if not tts_cache.cache_dir:
+        return
+    phrases = []
+    for phrase in TTS_PREWARM_PHRASES:
+        phrases.append(phrase)
+        phrases.extend(group_sentences(split_sentences(phrase)))
+    if TTS_FORMAT == 'pcm':
+        tts_cache.prewarm(phrases, TTS_VOICE_ID, 'pcm',
+                          lambda phrase: _polly_synthesize(phrase, 'pcm').read())
+    else:
+        tts_cache.prewarm(phrases, TTS_VOICE_ID, 'mp3',
+                          lambda phrase: _polly_synthesize(phrase, 'mp3').read())
+
+def iter_grouped_sentences(sentences: Iterable[str], min_chars: int = TTS_MIN_SEGMENT_CHARS) -> Iterator[str]:
+    """
+    合并过短的句子，避免为很短的片段单独调用Polly
+    句子可以逐句到达（例如流式回复），每段一凑够长度就立即产出
+    """
+    segment = ""
+    for sentence in sentences:
+        segment = f"{segment} {sentence}" if segment else sentence
+        if len(segment) >= min_chars:
+            yield segment
+            segment = ""
+    if segment:
+        yield segment
+
+def group_sentences(sentences: List[str], min_chars: int = TTS_MIN_SEGMENT_CHARS) -> List[str]:
+    """
+    一次性合并一组句子，见iter_grouped_sentences
+    """
+    return list(iter_grouped_sentences(sentences, min_chars))
+
+def synthesize_speech_pipelined(segments: Iterable[str], lookahead: int = TTS_LOOKAHEAD,
+                                synthesize: Callable[[str], Any] = None) -> Iterator[Any]:
+    """
+    并发合成各段语音，按顺序逐段产出音频
+    最多提前合成lookahead段，第一段合成完成即可开始播放；segments可以是
+    逐段到达的迭代器（例如流式回复），由后台线程读取，不会阻塞已合成段的播放。
+    生成器被关闭（例如播放被打断）时取消尚未开始的合成
+    """
+    synthesize = synthesize or synthesize_speech
+    executor = ThreadPoolExecutor(max_workers=lookahead, thread_name_prefix="tts")
+    futures: queue.Queue = queue.Queue()
+    slots = threading.Semaphore(lookahead)
+    stopped = threading.Event()
+
+    def feed():
+        try:
+            for segment in segments:
+                slots.acquire()
+                if stopped.is_set():
+                    break
+                futures.put(executor.submit(synthesize, segment))
+        except Exception as e:
+            print(f"❌ 读取回复出错: {e}")
+        finally:
+            futures.put(None)
+
+    threading.Thread(target=feed, name="tts-feed", daemon=True).start()
+    try:
+        while True:
+            future = futures.get()
+            if future is None:
+                break
+            slots.release()
+            yield future.result()
+    finally:
+        stopped.set()
+        slots.release()  # 唤醒等待中的读取线程
+        while True:
+            try:
+                future = futures.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _playback_functions():
+    if TTS_FORMAT == 'pcm':
+        return synthesize_speech_stream, play_pcm_stream
+    return synthesize_speech, play_mp3_segment
+
+def speak_response(text: str) -> None:
+    """
+    将回复转换为语音并播放（支持打断）
+    流水线模式下按句合成，第一句合成完成后立即开始播放；
+    PCM模式下直接播放Polly返回的音频流
+    """
+    synthesize, play_segment = _playback_functions()
+    
+    if not TTS_PIPELINE and TTS_FORMAT != 'pcm':
+        play_audio(synthesize_speech(text))
+        return
+    
+    if TTS_PIPELINE:
+        segments = synthesize_speech_pipelined(group_sentences(split_sentences(text)) or [text],
+                                               synthesize=synthesize)
+    else:
+        segments = [synthesize(text)]
+    
+    try:
+        completed = play_audio_segments_with_interrupt(segments, play_segment)
+        if not completed:
+            print("💡 您可以重新输入问题")
+    except Exception as e:
+        print(f"❌ 音频播放错误: {e}")
+        fallback_play_audio(synthesize_speech(text))
+
+def speak_streamed_response(sentences: Iterable[str]) -> None:
+    """
+    边接收边朗读流式回复（支持打断）
+    每凑够一段就开始合成，第一段合成完成即开始播放，无需等待完整回复；
+    未启用流水线时先收齐全部句子再整体播放
+    """
+    if not TTS_PIPELINE:
+        speak_response(" ".join(sentences))
+        return
+    
+    synthesize, play_segment = _playback_functions()
+    segments = synthesize_speech_pipelined(iter_grouped_sentences(sentences), synthesize=synthesize)
+    try:
+        completed = play_audio_segments_with_interrupt(segments, play_segment)
+        if not completed:
+            print("💡 您可以重新输入问题")
+    except Exception as e:
+        print(f"❌ 音频播放错误: {e}")
 
 def init_audio_system():
     """
     初始化音频系统
     """
     try:
+        import pygame
         pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
         pygame.mixer.init()
         print("✅ 音频系统初始化完成")
@@ -205,13 +499,80 @@ def create_interrupt_detector():
             return False
         return windows_input_detector
 
+def ensure_mixer() -> None:
+    """
+    确保pygame混音器已初始化
+    """
+    import pygame
+
+    if not pygame.mixer.get_init():
+        pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
+        pygame.mixer.init()
+
+def play_mp3_segment(audio_data: bytes, stop_event: threading.Event) -> None:
+    """
+    直接从内存缓冲区播放MP3音频（不写临时文件），直到播放结束或收到停止信号
+    """
+    import pygame
+
+    ensure_mixer()
+    pygame.mixer.music.load(io.BytesIO(audio_data), "mp3")
+    try:
+        pygame.mixer.music.play()
+        
+        # 更频繁地检查停止信号
+        while pygame.mixer.music.get_busy():
+            if stop_event.is_set():
+                pygame.mixer.music.stop()  # 立即停止播放
+                break
+            time.sleep(0.05)  # 减少检查间隔
+    finally:
+        pygame.mixer.music.unload()
+
+def play_pcm_stream(audio_stream, stop_event: threading.Event) -> None:
+    """
+    边下载边播放Polly返回的PCM音频流（16位单声道），收到停止信号时立即结束
+    """
+    import pyaudio
+
+    p = pyaudio.PyAudio()
+    output = p.open(format=pyaudio.paInt16, channels=1, rate=TTS_PCM_SAMPLE_RATE, output=True)
+    carry = b""
+    try:
+        for chunk in audio_stream.iter_chunks(chunk_size=TTS_PCM_CHUNK_BYTES):
+            if stop_event.is_set():
+                break
+            # 保证按完整的16位采样写入
+            chunk = carry + chunk
+            usable = len(chunk) - len(chunk) % 2
+            carry = chunk[usable:]
+            if usable:
+                output.write(chunk[:usable])
+    finally:
+        output.stop_stream()
+        output.close()
+        p.terminate()
+        audio_stream.close()
+
 def play_audio_with_interrupt(audio_data: bytes) -> bool:
     """
     播放音频，支持实时打断功能
     返回True表示播放完成，False表示被打断
     """
+    return play_audio_segments_with_interrupt([audio_data])
+
+def play_audio_segments_with_interrupt(segments: Iterable[Any],
+                                       play_segment: Callable[[Any, threading.Event], None] = None) -> bool:
+    """
+    依次播放多段音频，支持实时打断功能
+    segments可以是生成器（例如流水线合成），在播放线程中逐段取出；
+    被打断时关闭生成器，取消尚未完成的合成
+    play_segment决定每段的播放方式，默认从内存播放MP3
+    返回True表示播放完成，False表示被打断
+    """
     global audio_playing, audio_interrupted
     
+    play_segment = play_segment or play_mp3_segment
     audio_playing = True
     audio_interrupted = False
     
@@ -222,34 +583,19 @@ def play_audio_with_interrupt(audio_data: bytes) -> bool:
     def audio_playback():
         """音频播放线程"""
         try:
-            if not pygame.mixer.get_init():
-                pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
-                pygame.mixer.init()
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
-            
-            pygame.mixer.music.load(temp_file_path)
-            pygame.mixer.music.play()
-            
-            # 更频繁地检查停止信号
-            while pygame.mixer.music.get_busy():
+            for audio_data in segments:
                 if stop_event.is_set():
-                    pygame.mixer.music.stop()  # 立即停止播放
                     break
-                time.sleep(0.05)  # 减少检查间隔
-            
-            playback_finished.set()
+                play_segment(audio_data, stop_event)
             
         except Exception as e:
             print(f"❌ 音频播放错误: {e}")
-            playback_finished.set()
         finally:
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+            # 关闭生成器，取消剩余句子的合成
+            close = getattr(segments, "close", None)
+            if close:
+                close()
+            playback_finished.set()
     
     def interrupt_listener():
         """改进的输入监听线程"""
@@ -302,15 +648,10 @@ def fallback_play_audio(audio_data: bytes) -> None:
     降级音频播放方案（不支持打断）
     """
     try:
-        if not pygame.mixer.get_init():
-            pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
-            pygame.mixer.init()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
+        import pygame
+        ensure_mixer()
         
-        pygame.mixer.music.load(temp_file_path)
+        pygame.mixer.music.load(io.BytesIO(audio_data), "mp3")
         pygame.mixer.music.play()
         
         while pygame.mixer.music.get_busy():
@@ -321,27 +662,27 @@ def fallback_play_audio(audio_data: bytes) -> None:
     except Exception as e:
         print(f"❌ 降级播放失败: {e}")
         system_play_audio(audio_data)
-    finally:
-        try:
-            time.sleep(0.5)
-            os.unlink(temp_file_path)
-        except:
-            pass
 
 def system_play_audio(audio_data: bytes) -> None:
     """
     系统命令播放方案
+    Linux下通过标准输入把音频交给mpg123，其他系统的播放器需要临时文件
     """
+    system = platform.system().lower()
+    if system == 'linux':
+        try:
+            subprocess.run(['mpg123', '-q', '-'], input=audio_data,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception as e:
+            print(f"❌ 系统播放也失败: {e}")
+        return
+    
     with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
         temp_file.write(audio_data)
         temp_file_path = temp_file.name
     
     try:
-        system = platform.system().lower()
-        if system == 'linux':
-            subprocess.run(['mpg123', temp_file_path], 
-                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        elif system == 'darwin':
+        if system == 'darwin':
             subprocess.run(['afplay', temp_file_path])
         elif system == 'windows':
             subprocess.run(['start', '', temp_file_path], shell=True)
@@ -353,70 +694,18 @@ def system_play_audio(audio_data: bytes) -> None:
         except:
             pass
 
-class CustomerServiceSystem:
-    """Main customer service system that coordinates agents and services."""
-    
-    def __init__(self, model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0", region: str = "us-west-2"):
-        """Initialize the customer service system with its agents and services."""
-        self.intent_agent = IntentRecognitionAgent(model_id=model_id, region=region)
-        self.order_agent = OrderIssueAgent(model_id=model_id, region=region)
-        self.logistics_agent = LogisticsIssueAgent(model_id=model_id, region=region)
-        
-        self.order_service = OrderService()
-        self.sop_service = SOPService()
-        
-        self.conversations: Dict[str, Dict[str, Any]] = {}
-    
-    def process_question(self, user_question: str, conversation_id: Optional[str] = None) -> tuple[str, str]:
-        """Process a customer question through the multi-agent system."""
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
-            self.conversations[conversation_id] = {"order_id": None, "history": []}
-        
-        self.conversations[conversation_id]["history"].append({"role": "user", "content": user_question})
-        
-        intent, _ = self.intent_agent.process(
-            user_question,
-            conversation_id,
-            history=self.conversations[conversation_id]["history"]
-        )
-        print(f"Intent recognized: {intent}")
-        
-        import re
-        order_id_match = re.search(r'order\s+(?:id\s+)?(?:number\s+)?(?:#\s*)?(\d+)', 
-                                 user_question, re.IGNORECASE)
-        if order_id_match:
-            self.conversations[conversation_id]["order_id"] = order_id_match.group(1)
-        
-        if intent == "ORDER":
-            response, _ = self.order_agent.process(
-                user_question, 
-                conversation_id,
-                order_id=self.conversations[conversation_id].get("order_id"),
-                history=self.conversations[conversation_id]["history"]
-            )
-        elif intent == "LOGISTICS":
-            response, _ = self.logistics_agent.process(
-                user_question,
-                conversation_id,
-                order_id=self.conversations[conversation_id].get("order_id"),
-                history=self.conversations[conversation_id]["history"]
-            )
-        else:
-            response = "I'm not sure if your question is about an order or logistics issue. Could you please provide more details?"
-        
-        self.conversations[conversation_id]["history"].append({"role": "assistant", "content": response})
-        
-        return response, conversation_id
-
 async def interactive_session():
     """运行交互会话，支持动态语音输入和文本输入"""
+    import aioconsole
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
     # 初始化音频系统
     audio_available = init_audio_system()
+    threading.Thread(target=prewarm_tts_cache, name="tts-prewarm", daemon=True).start()
     if not audio_available:
         print("💡 音频播放可能受限，建议安装: pip install pygame")
 
-    system = CustomerServiceSystem()
+    # All questions go to the MCP server; the client holds no order or agent state
     conversation_id = None
     
     print("Welcome to Fashion E-commerce Customer Service!")
@@ -436,55 +725,63 @@ async def interactive_session():
         }
     })
 
-    tools = await client.get_tools()
-    process_question_tool = next(tool for tool in tools if tool.name == "process_question")
-
-    while True:
-        # 确保不在播放状态时才接受输入
-        if audio_playing:
-            await asyncio.sleep(0.1)
-            continue
+    # 使用流式工具：服务器每生成一句就通过进度通知发送，客户端随即开始合成和播放
+    async with client.session("customer_service") as session:
+        while True:
+            # 确保不在播放状态时才接受输入
+            if audio_playing:
+                await asyncio.sleep(0.1)
+                continue
+                
+            # 提供智能语音和文本输入选择
+            user_input = await aioconsole.ainput("\nCustomer (🎤 Enter=Smart Voice | ✏️ Type=Text): ")
             
-        # 提供智能语音和文本输入选择
-        user_input = await aioconsole.ainput("\nCustomer (🎤 Enter=Smart Voice | ✏️ Type=Text): ")
-        
-        if user_input.lower() == 'exit':
-            print("Thank you for using our customer service. Goodbye!")
-            break
-        
-        # 如果用户按了Enter（空输入），启动智能语音录制
-        if not user_input:
-            try:
-                print("🎤 智能语音录制启动...")
-                user_input = await stream_audio_to_text_dynamic()
-                print(f"📝 最终转录结果: {user_input}")
-            except Exception as e:
-                print(f"❌ 语音录制或转录错误: {str(e)}")
+            if user_input.lower() == 'exit':
+                print("Thank you for using our customer service. Goodbye!")
+                break
+            
+            # 如果用户按了Enter（空输入），启动智能语音录制
+            if not user_input:
+                try:
+                    print("🎤 智能语音录制启动...")
+                    user_input = await stream_audio_to_text_dynamic()
+                    print(f"📝 最终转录结果: {user_input}")
+                except Exception as e:
+                    print(f"❌ 语音录制或转录错误: {str(e)}")
+                    continue
+            
+            # 检查输入是否有效
+            if not user_input.strip():
+                print("⚠️ 未检测到有效输入，请重试")
                 continue
-        
-        # 检查输入是否有效
-        if not user_input.strip():
-            print("⚠️ 未检测到有效输入，请重试")
-            continue
-        
-        # 处理用户输入（无论是语音转换的还是直接输入的文本）
-        try:
-            result = await process_question_tool.arun({
-                "question": user_input,
-                "conversation_id": conversation_id
-            })
-            response_data = json.loads(result)
-            response_text = response_data['response']
-            print(f"\nAgent: {response_text}")
             
-            # 转换为语音并播放（支持打断）
-            audio_data = synthesize_speech(response_text)
-            play_audio(audio_data)
+            # 处理用户输入（无论是语音转换的还是直接输入的文本）
+            sentences: queue.Queue = queue.Queue()
             
-            conversation_id = response_data['conversation_id']
+            async def on_progress(progress, total, message):
+                # 每条进度通知是回复中刚生成的一句
+                if message:
+                    print(f"\nAgent: {message}" if progress == 1 else message)
+                    sentences.put(message)
             
-        except Exception as e:
-            print(f"\n❌ 处理问题时出错: {str(e)}")
+            # 在后台线程中边接收边朗读（支持打断）
+            speaking = asyncio.create_task(asyncio.to_thread(speak_streamed_response, iter(sentences.get, None)))
+            try:
+                result = await session.call_tool(
+                    "process_question_stream",
+                    {"question": user_input, "conversation_id": conversation_id},
+                    progress_callback=on_progress
+                )
+                response_data = json.loads(result.content[0].text)
+                if "error" in response_data:
+                    print(f"\n❌ 处理问题时出错: {response_data['error']}")
+                else:
+                    conversation_id = response_data['conversation_id']
+            except Exception as e:
+                print(f"\n❌ 处理问题时出错: {str(e)}")
+            finally:
+                sentences.put(None)
+                await speaking
 
 if __name__ == "__main__":
     asyncio.run(interactive_session())
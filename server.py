@@ -1,24 +1,83 @@
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
+import argparse
+import asyncio
 import json
+import os
+import subprocess
+import sys
 import uuid
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from main import CustomerServiceSystem
+from customer_service import get_system
+from services.order_service import MAX_ORDERS_PER_CALL, JournalSyncError, VersionConflictError
 
 # Initialize FastMCP server
 mcp = FastMCP("CustomerService")
-system = CustomerServiceSystem()
+
+# Tools use the process-wide system shared with config/mcp_config.py; it is
+# created on the first call and configured from the CS_* environment variables
+# (see README)
+
+# Bound the number of customer turns in flight and how long each may take
+MAX_CONCURRENT_QUESTIONS = int(os.getenv("CS_MAX_CONCURRENT_QUESTIONS", "16"))
+QUESTION_TIMEOUT_SECONDS = float(os.getenv("CS_QUESTION_TIMEOUT_SECONDS", "60"))
+question_slots = asyncio.Semaphore(MAX_CONCURRENT_QUESTIONS)
 
 @mcp.tool()
 async def process_question(question: str, conversation_id: Optional[str] = None) -> str:
     """Process a customer service question and return a response."""
     try:
-        response, new_conversation_id = system.process_question(question, conversation_id)
+        async with question_slots:
+            response, new_conversation_id = await asyncio.wait_for(
+                get_system().aprocess_question(question, conversation_id),
+                timeout=QUESTION_TIMEOUT_SECONDS
+            )
         result = {
             "response": response,
             "conversation_id": new_conversation_id
         }
         return json.dumps(result, ensure_ascii=False)
+    except asyncio.TimeoutError:
+        return json.dumps({
+            "error": f"Request timed out after {QUESTION_TIMEOUT_SECONDS} seconds",
+            "question": question
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": f"An error occurred: {str(e)}",
+            "question": question
+        })
+
+@mcp.tool()
+async def process_question_stream(question: str, conversation_id: Optional[str] = None, ctx: Context = None) -> str:
+    """Process a customer service question, streaming the response.
+    
+    Each sentence is sent as a progress notification as soon as it has been
+    generated; the complete response is returned at the end as with process_question.
+    """
+    conversation_id = conversation_id or str(uuid.uuid4())
+    sentences = []
+    # The response as recorded in the conversation, which keeps its line breaks
+    recorded = []
+    
+    async def stream():
+        async for sentence in get_system().astream_question(question, conversation_id, recorded.append):
+            sentences.append(sentence)
+            if ctx is not None:
+                await ctx.report_progress(progress=len(sentences), total=None, message=sentence)
+    
+    try:
+        async with question_slots:
+            await asyncio.wait_for(stream(), timeout=QUESTION_TIMEOUT_SECONDS)
+        return json.dumps({
+            "response": recorded[0],
+            "conversation_id": conversation_id
+        }, ensure_ascii=False)
+    except asyncio.TimeoutError:
+        return json.dumps({
+            "error": f"Request timed out after {QUESTION_TIMEOUT_SECONDS} seconds",
+            "question": question
+        })
     except Exception as e:
         return json.dumps({
             "error": f"An error occurred: {str(e)}",
@@ -29,10 +88,14 @@ async def process_question(question: str, conversation_id: Optional[str] = None)
 async def get_order_info(order_id: str) -> str:
     """Get information about a specific order."""
     try:
-        order_info = system.order_service.get_order_info(order_id)
+        order_service = get_system().order_service
+        # Lookups may wait for the order files (in shared mode for other workers), so
+        # they run in worker threads like the updates
+        order_info = await asyncio.to_thread(order_service.get_order_info, order_id)
         if order_info:
             return json.dumps({
-                "order": order_info
+                "order": order_info,
+                "version": await asyncio.to_thread(order_service.get_order_version, order_id)
             }, ensure_ascii=False)
         return json.dumps({
             "error": f"Order {order_id} not found",
@@ -45,37 +108,141 @@ async def get_order_info(order_id: str) -> str:
         })
 
 @mcp.tool()
-async def update_order_address(order_id: str, new_address: str) -> str:
-    """Update the delivery address for an order."""
+async def update_order_address(order_id: str, new_address: str, expected_version: Optional[int] = None) -> str:
+    """Update the delivery address for an order.
+    
+    Pass the version returned by get_order_info as expected_version to reject
+    the update if the order was changed by someone else in the meantime.
+    """
     try:
-        success = system.order_service.update_address(order_id, new_address)
+        order_service = get_system().order_service
+        success = await asyncio.to_thread(
+            order_service.update_address, order_id, new_address, expected_version
+        )
         if success:
-            updated_order = system.order_service.get_order_info(order_id)
+            updated_order = await asyncio.to_thread(order_service.get_order_info, order_id)
             return json.dumps({
                 "message": "Address updated successfully",
-                "order": updated_order
+                "order": updated_order,
+                "version": await asyncio.to_thread(order_service.get_order_version, order_id)
             }, ensure_ascii=False)
         return json.dumps({
             "error": f"Failed to update address for order {order_id}",
             "order_id": order_id
         })
+    except VersionConflictError as e:
+        return json.dumps({
+            "error": str(e),
+            "order_id": order_id,
+            "current_version": e.current_version
+        })
+    except JournalSyncError as e:
+        return json.dumps({
+            "error": str(e),
+            "order_id": order_id
+        })
     except Exception as e:
         return json.dumps({
             "error": f"An error occurred: {str(e)}",
             "order_id": order_id
         })
 
+@mcp.tool()
+async def get_orders(order_ids: List[str]) -> str:
+    """Get information about several orders in one call."""
+    try:
+        if len(order_ids) > MAX_ORDERS_PER_CALL:
+            return json.dumps({
+                "error": f"At most {MAX_ORDERS_PER_CALL} orders per call",
+                "order_ids": order_ids
+            })
+        order_service = get_system().order_service
+        orders = await asyncio.to_thread(order_service.get_orders, order_ids)
+        return json.dumps({
+            "orders": list(orders.values()),
+            "versions": await asyncio.to_thread(order_service.get_order_versions, list(orders)),
+            "not_found": [order_id for order_id in order_ids if order_id not in orders]
+        }, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({
+            "error": f"An error occurred: {str(e)}",
+            "order_ids": order_ids
+        })
+
+@mcp.tool()
+async def list_orders(status: Optional[str] = None, cursor: Optional[str] = None, limit: int = 100) -> str:
+    """List orders page by page, optionally only those with a given status.
+    
+    Pass the returned next_cursor as cursor to get the following page;
+    next_cursor is null after the last page.
+    """
+    try:
+        orders, next_cursor = await asyncio.to_thread(
+            get_system().order_service.list_orders, status=status, cursor=cursor, limit=min(limit, MAX_ORDERS_PER_CALL)
+        )
+        return json.dumps({
+            "orders": orders,
+            "next_cursor": next_cursor
+        }, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({
+            "error": f"An error occurred: {str(e)}",
+            "status": status,
+            "cursor": cursor
+        })
+
+@mcp.tool()
+async def update_order_addresses(updates: List[Dict[str, Any]]) -> str:
+    """Update the delivery addresses of several orders at once.
+    
+    Each update has order_id, new_address and optionally expected_version.
+    The updates are applied atomically: if any order does not exist or is no
+    longer at its expected version, no address is changed.
+    """
+    try:
+        if len(updates) > MAX_ORDERS_PER_CALL:
+            return json.dumps({"error": f"At most {MAX_ORDERS_PER_CALL} orders per call"})
+        order_service = get_system().order_service
+        order_ids = [update["order_id"] for update in updates]
+        success = await asyncio.to_thread(order_service.update_addresses, updates)
+        if success:
+            return json.dumps({
+                "message": f"Updated {len(updates)} addresses successfully",
+                "orders": list((await asyncio.to_thread(order_service.get_orders, order_ids)).values()),
+                "versions": await asyncio.to_thread(order_service.get_order_versions, order_ids)
+            }, ensure_ascii=False)
+        existing = await asyncio.to_thread(order_service.get_orders, order_ids)
+        return json.dumps({
+            "error": "Failed to update addresses; no order was changed",
+            "not_found": [order_id for order_id in order_ids if order_id not in existing]
+        })
+    except VersionConflictError as e:
+        return json.dumps({
+            "error": f"{str(e)}; no order was changed",
+            "order_id": e.order_id,
+            "current_version": e.current_version
+        })
+    except JournalSyncError as e:
+        return json.dumps({
+            "error": str(e),
+            "order_ids": e.order_ids
+        })
+    except Exception as e:
+        return json.dumps({
+            "error": f"An error occurred: {str(e)}"
+        })
+
 @mcp.tool()
 async def get_sop_tree(sop_type: str) -> str:
     """Get a specific SOP decision tree."""
     try:
         if sop_type.lower() == "order":
             return json.dumps({
-                "decision_tree": system.sop_service.order_decision_tree
+                "decision_tree": get_system().sop_service.order_decision_tree
             }, ensure_ascii=False)
         elif sop_type.lower() == "logistics":
             return json.dumps({
-                "decision_tree": system.sop_service.logistics_decision_tree
+                "decision_tree": get_system().sop_service.logistics_decision_tree
             }, ensure_ascii=False)
         return json.dumps({
             "error": f"Unknown SOP type: {sop_type}",
@@ -87,5 +254,50 @@ async def get_sop_tree(sop_type: str) -> str:
             "sop_type": sop_type
         })
 
+@mcp.tool()
+async def get_metrics() -> str:
+    """Get runtime metrics such as the intent fast-path hit rate and latencies."""
+    return json.dumps(get_system().get_metrics(), ensure_ascii=False)
+
+def run_workers(workers: int, host: str, port: int) -> None:
+    """Run one server process per worker on consecutive ports.
+    
+    Workers share conversations (SQLite) and orders (file-locked journal), so
+    any worker can continue any conversation. Each SSE session stays on the
+    worker it connected to; spread clients across the ports, e.g. with a
+    load balancer that pins each session to one upstream.
+    """
+    env = dict(os.environ, CS_SHARED_STATE="1")
+    processes: List[subprocess.Popen] = []
+    try:
+        for i in range(workers):
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--host", host,
+                 "--port", str(port + i), "--workers", "1"],
+                env=env
+            ))
+            print(f"Started worker {i + 1}/{workers} on {host}:{port + i}")
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+
 if __name__ == "__main__":
-    mcp.run(transport="sse")
+    parser = argparse.ArgumentParser(description="Customer service MCP server")
+    parser.add_argument("--host", default=os.getenv("CS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CS_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CS_WORKERS", "1")),
+                        help="number of server processes, listening on consecutive ports")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        run_workers(args.workers, args.host, args.port)
+    else:
+        get_system()  # pay the startup cost before accepting connections
+        mcp.run(transport="sse", host=args.host, port=args.port)
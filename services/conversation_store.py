@@ -0,0 +1,145 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class SQLiteConversationBackend:
+    """On-disk conversation persistence backed by a SQLite database.
+
+    The database runs in WAL mode with a busy timeout, so several worker
+    processes can share it.
+    """
+
+    def __init__(self, path: str = "conversations.db", busy_timeout: float = 30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "conversation_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        data = json.dumps(conversation, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversations (conversation_id, data, updated_at) VALUES (?, ?, ?)",
+                (conversation_id, data, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ConversationStore:
+    """Bounded in-memory conversation store with LRU and idle-TTL eviction.
+
+    At most ``max_entries`` conversations are kept in memory; the least recently
+    used one is evicted when the limit is reached, and conversations idle for
+    longer than ``ttl_seconds`` are dropped. With a backend, every saved turn is
+    written through to it, so an evicted conversation is rehydrated transparently
+    on its next turn.
+
+    With ``shared=True`` the backend is the source of truth: other processes
+    may continue any conversation, so ``get`` always reads it from the backend
+    and the memory tier only holds conversations created but not yet saved.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 1800,
+                 backend: Optional[SQLiteConversationBackend] = None, shared: bool = False):
+        if shared and backend is None:
+            raise ValueError("A shared conversation store needs a backend")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_conversation() -> Dict[str, Any]:
+        return {"order_id": None, "history": []}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
+
+    def _expire(self, now: float) -> None:
+        """Drop conversations idle past the TTL (oldest first)."""
+        if self.ttl_seconds is None:
+            return
+        while self._entries:
+            conversation_id, (last_access, _) = next(iter(self._entries.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            del self._entries[conversation_id]
+
+    def _put(self, conversation_id: str, conversation: Dict[str, Any], now: float) -> None:
+        self._entries[conversation_id] = (now, conversation)
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Get a conversation, rehydrating it from the backend if it was evicted."""
+        now = time.monotonic()
+        if self.shared:
+            conversation = self.backend.load(conversation_id)
+            if conversation is not None:
+                return conversation
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                self._put(conversation_id, entry[1], now)
+                return entry[1]
+        if self.backend is None or self.shared:
+            return None
+        conversation = self.backend.load(conversation_id)
+        if conversation is not None:
+            with self._lock:
+                self._put(conversation_id, conversation, now)
+        return conversation
+
+    def get_or_create(self, conversation_id: str) -> Dict[str, Any]:
+        """Get a conversation, starting a new one if it is unknown."""
+        conversation = self.get(conversation_id)
+        if conversation is None:
+            conversation = self.new_conversation()
+            with self._lock:
+                self._put(conversation_id, conversation, time.monotonic())
+        return conversation
+
+    def save(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        """Store a conversation after a turn and persist it to the backend."""
+        with self._lock:
+            self._put(conversation_id, conversation, time.monotonic())
+        if self.backend is not None:
+            self.backend.save(conversation_id, conversation)
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+        if self.backend is not None:
+            self.backend.delete(conversation_id)
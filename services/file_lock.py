@@ -0,0 +1,42 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+
+class FileLock:
+    """Advisory lock on a file, shared between processes (POSIX ``flock``).
+
+    The lock is reentrant for its holder: nested acquisitions only bump a
+    counter, so code holding it exclusively may call code that takes it shared.
+    It does not serialize threads of the same process; callers must hold their
+    own thread lock around every acquisition.
+    """
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("Sharing state between processes requires fcntl (POSIX only)")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._depth = 0
+
+    @contextmanager
+    def acquire(self, exclusive: bool = True) -> Iterator[None]:
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
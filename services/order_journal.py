@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+from typing import List, Dict, Optional
+
+# Records with this op are written by truncate() to carry state across a
+# compaction; they do not count as pending records.
+CHECKPOINT_OP = "checkpoint"
+
+
+class OrderJournal:
+    """Append-only log of order mutations.
+
+    Each record is one JSON object on its own line, so the cost of a write is
+    proportional to the size of the change. A torn final line left by a crash is
+    ignored on replay. The log is truncated after its records have been folded
+    into a fresh snapshot by the compactor.
+
+    The journal remembers the byte offset up to which it has been read, so
+    records appended by other processes can be picked up with ``read_new()``.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        # Group commit: records are numbered as they are written, and one fsync
+        # makes every record written before it started durable
+        self._synced = threading.Condition(self._lock)
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._syncing = False
+        self._file = None
+        self._pending = 0
+        self._offset = 0
+
+    def __len__(self) -> int:
+        """Number of records appended since the last truncation."""
+        return self._pending
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def write(self, record: Dict) -> None:
+        """Append a record to the log without waiting for it to reach the disk."""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            file = self._open()
+            file.write(line)
+            file.flush()
+            self._pending += 1
+            self._offset += len(line.encode('utf-8'))
+            self._written_seq += 1
+
+    def sync(self) -> None:
+        """Wait until every record written so far is on disk.
+
+        Concurrent callers share fsyncs: one of them syncs everything written
+        up to that point while the others wait for it, and records written
+        meanwhile are covered by the next fsync. The fsync runs outside the
+        journal lock on a duplicated descriptor, so writing continues.
+        """
+        if not self.fsync:
+            return
+        with self._synced:
+            target = self._written_seq
+            while self._synced_seq < target:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+                if self._file is None:
+                    return
+                self._syncing = True
+                covered = self._written_seq
+                fd = os.dup(self._file.fileno())
+                self._lock.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._synced.notify_all()
+                self._synced_seq = max(self._synced_seq, covered)
+
+    def append(self, record: Dict) -> None:
+        """Durably append a single record to the log."""
+        self.write(record)
+        self.sync()
+
+    def _read_from(self, offset: int) -> List[Dict]:
+        """Parse the complete records after ``offset`` and advance past them."""
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            data = b""
+        end = data.rfind(b"\n") + 1  # a torn final line is left for later
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Skipping corrupt journal record: {str(e)}")
+        self._offset = offset + end
+        self._pending += sum(1 for record in records if record.get("op") != CHECKPOINT_OP)
+        return records
+
+    def replay(self) -> List[Dict]:
+        """Read every complete record currently in the log."""
+        with self._lock:
+            self._pending = 0
+            return self._read_from(0)
+
+    def read_new(self) -> List[Dict]:
+        """Read the records appended since the log was last read or written."""
+        with self._lock:
+            return self._read_from(self._offset)
+
+    def unread_bytes(self) -> int:
+        """Bytes appended since the last read; negative if the log was truncated."""
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        return size - self._offset
+
+    def truncate(self, checkpoint: Optional[Dict] = None) -> None:
+        """Discard all records once they are captured in a snapshot.
+
+        If given, ``checkpoint`` is written as the first record of the new log.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with open(self.path, 'w', encoding='utf-8') as file:
+                if checkpoint is not None:
+                    line = json.dumps(dict(checkpoint, op=CHECKPOINT_OP), ensure_ascii=False,
+                                      separators=(',', ':')) + "\n"
+                    file.write(line)
+                    file.flush()
+                    if self.fsync:
+                        os.fsync(file.fileno())
+            self._pending = 0
+            self._offset = os.stat(self.path).st_size
+            # The discarded records are part of the snapshot now
+            self._synced_seq = self._written_seq
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
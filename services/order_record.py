@@ -0,0 +1,118 @@
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+FIELDS = ("order_id", "customer_name", "items", "address", "status")
+_FIELD_SET = frozenset(FIELDS)
+_ALL_PRESENT = (1 << len(FIELDS)) - 1
+
+
+class _Missing:
+    """Marks a standard field that the order does not have."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+MISSING = _Missing()
+
+
+def _compact(field: str, value: Any) -> Any:
+    """Shrink a field value for storage: statuses and item names repeat across
+    orders and are interned so every order shares one string; item lists
+    become tuples."""
+    if field == "status" and isinstance(value, str):
+        return sys.intern(value)
+    if field == "items" and isinstance(value, list):
+        return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+    return value
+
+
+class OrderRecord:
+    """Compact in-memory form of one order.
+
+    The standard fields live in slots instead of a per-order dict, and any
+    other fields in ``extra``. ``to_dict()`` rebuilds the dict callers see,
+    with the same keys and values as the order it was created from.
+    """
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, order_id: str, customer_name: Any = MISSING, items: Any = MISSING,
+                 address: Any = MISSING, status: Any = MISSING, extra: Optional[Dict] = None):
+        self.order_id = order_id
+        self.customer_name = customer_name
+        self.items = _compact("items", items)
+        self.address = address
+        self.status = _compact("status", status)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, order: Dict) -> "OrderRecord":
+        extra = {key: value for key, value in order.items() if key not in _FIELD_SET}
+        return cls(order["order_id"], order.get("customer_name", MISSING), order.get("items", MISSING),
+                   order.get("address", MISSING), order.get("status", MISSING), extra)
+
+    def to_dict(self) -> Dict:
+        """A new dict that callers may mutate freely."""
+        order = {}
+        for field in FIELDS:
+            value = getattr(self, field)
+            if value is not MISSING:
+                order[field] = list(value) if isinstance(value, tuple) else value
+        if self.extra:
+            order.update(self.extra)
+        return order
+
+    def get(self, field: str, default: Any = None) -> Any:
+        if field in _FIELD_SET:
+            value = getattr(self, field)
+            return default if value is MISSING else value
+        return self.extra.get(field, default) if self.extra else default
+
+    def update(self, fields: Dict) -> None:
+        for field, value in fields.items():
+            if field in _FIELD_SET:
+                setattr(self, field, _compact(field, value))
+            else:
+                self.extra = dict(self.extra or {}, **{field: value})
+
+    def to_row(self) -> Tuple:
+        """Plain tuple of the record for binary snapshots; missing fields become a bit mask."""
+        present = 0
+        values = []
+        for bit, field in enumerate(FIELDS):
+            value = getattr(self, field)
+            if value is not MISSING:
+                present |= 1 << bit
+            values.append(None if value is MISSING else value)
+        return (present, *values, self.extra)
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "OrderRecord":
+        # Rows come from to_row(), so values are already compacted; marshal
+        # keeps strings interned
+        present, order_id, customer_name, items, address, status, extra = row
+        record = cls.__new__(cls)
+        record.order_id = order_id
+        record.customer_name = customer_name
+        record.items = items
+        record.address = address
+        record.status = status
+        record.extra = extra
+        if present != _ALL_PRESENT:
+            for bit, field in enumerate(FIELDS):
+                if not present & (1 << bit):
+                    setattr(record, field, MISSING)
+        return record
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, OrderRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"OrderRecord({self.to_dict()!r})"
@@ -1,11 +1,24 @@
 import json
 import os
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
+from services.order_store import JournalSyncError, OrderStore, VersionConflictError
+
+# Reused for every line; json.dumps() with options builds a new encoder per call
+NDJSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+# Upper bound on the orders read or written by one batch tool call
+MAX_ORDERS_PER_CALL = int(os.getenv("CS_MAX_ORDERS_PER_CALL", "500"))
 
 class OrderService:
-    def __init__(self, data_file: str = "order_data.txt"):
+    def __init__(self, data_file: str = "order_data.txt", compact_interval: float = 30.0,
+                 shared: bool = False):
+        """Set shared=True when several processes serve the same order data file."""
         self.data_file = data_file
+        self.store = OrderStore(data_file, shared=shared)
+        self._update_listeners: List[Callable[[str], None]] = []
         self._initialize_data()
+        self.store.load()
+        self.store.start_compactor(compact_interval)
     
     def _initialize_data(self):
         """Initialize order data file if it doesn't exist."""
@@ -17,20 +30,50 @@ class OrderService:
             ]
             self.save_order_data(initial_data)
     
+    def add_update_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(order_id) after an order was changed through this service."""
+        self._update_listeners.append(listener)
+    
+    def _notify_update(self, order_id: str) -> None:
+        for listener in self._update_listeners:
+            try:
+                listener(order_id)
+            except Exception as e:
+                print(f"Error notifying order update listener: {str(e)}")
+    
     def get_order_data(self) -> List[Dict]:
-        """Read order data from file."""
-        try:
-            with open(self.data_file, 'r') as file:
-                return json.load(file)
-        except Exception as e:
-            print(f"Error reading order data: {str(e)}")
-            return []
+        """Get all orders from the in-memory index.
+        
+        This copies every order at once; use iter_order_pages() or
+        export_ndjson() to go through large order sets.
+        """
+        return self.store.all()
+    
+    def iter_order_pages(self, status: Optional[str] = None, page_size: int = 500) -> Iterator[List[Dict]]:
+        """Yield all orders (optionally only those with a status) page by page.
+        
+        Only one page of copies exists at a time, so memory stays bounded by
+        page_size however many orders there are. Orders updated while the
+        iteration runs are returned as they are when their page is read.
+        """
+        cursor = None
+        while True:
+            orders, cursor = self.store.page(status=status, cursor=cursor, limit=page_size)
+            if orders:
+                yield orders
+            if cursor is None:
+                return
+    
+    def export_ndjson(self, status: Optional[str] = None, page_size: int = 500) -> Iterator[str]:
+        """Yield all orders as newline-delimited JSON, one chunk of lines per page."""
+        encode = NDJSON_ENCODER.encode
+        for orders in self.iter_order_pages(status=status, page_size=page_size):
+            yield "".join([encode(order) + "\n" for order in orders])
     
     def save_order_data(self, order_data: List[Dict]) -> bool:
         """Save order data to file."""
         try:
-            with open(self.data_file, 'w') as file:
-                json.dump(order_data, file, indent=2)
+            self.store.replace_all(order_data)
             return True
         except Exception as e:
             print(f"Error saving order data: {str(e)}")
@@ -38,16 +81,89 @@ class OrderService:
     
     def get_order_info(self, order_id: str) -> Optional[Dict]:
         """Get information for a specific order."""
-        order_data = self.get_order_data()
-        return next((order for order in order_data if order["order_id"] == order_id), None)
+        return self.store.get(order_id)
+    
+    def get_orders(self, order_ids: List[str]) -> Dict[str, Dict]:
+        """Get several orders in one call; IDs that do not exist are left out."""
+        return self.store.get_many(order_ids)
     
-    def update_address(self, order_id: str, new_address: str) -> bool:
-        """Update the address for a specific order."""
-        order_data = self.get_order_data()
+    def get_order_versions(self, order_ids: List[str]) -> Dict[str, int]:
+        """Get the current versions of several orders; IDs that do not exist are left out."""
+        return self.store.versions(order_ids)
+    
+    def list_orders(self, status: Optional[str] = None, cursor: Optional[str] = None,
+                    limit: int = 100) -> Tuple[List[Dict], Optional[str]]:
+        """Get a page of orders, optionally only those with a given status.
         
-        for order in order_data:
-            if order["order_id"] == order_id:
-                order["address"] = new_address
-                return self.save_order_data(order_data)
+        Pass the returned cursor to get the next page; it is None after the last
+        page. Raises ValueError for an unknown cursor or a limit below 1.
+        """
+        return self.store.page(status=status, cursor=cursor, limit=limit)
+    
+    def find_orders_by_customer(self, customer_name: str) -> List[Dict]:
+        """Get all orders for a customer."""
+        return self.store.find_by_customer(customer_name)
+    
+    def find_orders_by_status(self, status: str) -> List[Dict]:
+        """Get all orders with a specific status."""
+        return self.store.find_by_status(status)
+    
+    def get_order_version(self, order_id: str) -> Optional[int]:
+        """Get the current version of an order for optimistic updates."""
+        return self.store.version(order_id)
+    
+    def update_address(self, order_id: str, new_address: str, expected_version: Optional[int] = None) -> bool:
+        """Update the address for a specific order.
         
-        return False
+        The change is appended to the order journal rather than rewriting the
+        whole data file; the background compactor folds it into the snapshot.
+        If expected_version is given, the update only succeeds if the order is
+        still at that version, otherwise VersionConflictError is raised.
+        JournalSyncError is raised if the new address is live but could not be
+        synced to disk.
+        """
+        try:
+            updated = self.store.update(order_id, {"address": new_address}, expected_version=expected_version)
+        except JournalSyncError:
+            self._notify_update(order_id)
+            raise
+        except VersionConflictError:
+            raise
+        except Exception as e:
+            print(f"Error saving order data: {str(e)}")
+            return False
+        if updated:
+            self._notify_update(order_id)
+        return updated
+    
+    def update_addresses(self, updates: List[Dict[str, Any]]) -> bool:
+        """Update the addresses of several orders in one atomic journal write.
+        
+        Each update is a dict with ``order_id``, ``new_address`` and optionally
+        ``expected_version``. Either every address is changed or none: False is
+        returned if an order does not exist, and VersionConflictError is raised
+        if an order is no longer at its expected version. JournalSyncError is
+        raised if the new addresses are live but could not be synced to disk.
+        """
+        try:
+            updated = self.store.update_many([
+                (update["order_id"], {"address": update["new_address"]}, update.get("expected_version"))
+                for update in updates
+            ])
+        except JournalSyncError as e:
+            for order_id in e.order_ids:
+                self._notify_update(order_id)
+            raise
+        except (VersionConflictError, KeyError, ValueError):
+            raise
+        except Exception as e:
+            print(f"Error saving order data: {str(e)}")
+            return False
+        if updated:
+            for update in updates:
+                self._notify_update(update["order_id"])
+        return updated
+    
+    def close(self):
+        """Flush pending journal records into the data file."""
+        self.store.close()
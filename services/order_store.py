@@ -0,0 +1,559 @@
+import contextlib
+import gc
+import json
+import marshal
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+from services.file_lock import FileLock
+from services.order_journal import OrderJournal
+from services.order_record import MISSING, OrderRecord
+
+# Bump when the layout of binary snapshot rows changes
+BINARY_SNAPSHOT_FORMAT = 1
+
+# Number of locks that order updates are spread over by order ID
+ORDER_LOCK_STRIPES = 64
+
+# Read once at import; os.umask() can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class VersionConflictError(Exception):
+    """Raised when an order changed since the version the caller last read."""
+
+    def __init__(self, order_id: str, expected_version: int, current_version: int):
+        super().__init__(
+            f"Order {order_id} is at version {current_version}, expected {expected_version}"
+        )
+        self.order_id = order_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+class JournalSyncError(Exception):
+    """Raised when an update is applied and journaled but could not be fsynced.
+
+    The change is live and visible to readers of the journal file, so it is
+    not rolled back; it may be lost if the machine crashes before the page
+    cache reaches the disk.
+    """
+
+    def __init__(self, order_ids: List[str], error: OSError):
+        super().__init__(
+            f"Updated order(s) {', '.join(order_ids)} but could not sync the journal to disk: {error}"
+        )
+        self.order_ids = order_ids
+        self.error = error
+
+
+class OrderStore:
+    """In-memory, indexed view of the order data file.
+
+    The JSON file is the snapshot and remains the source of truth. It is loaded
+    once into a dict keyed by order_id, with secondary indexes by customer name
+    and status, and is reloaded only when the file's mtime changes. The mtime is
+    checked at most once every ``reload_interval`` seconds, so lookups normally
+    never touch the disk.
+
+    Mutations are appended to an ``OrderJournal`` next to the snapshot and
+    replayed on top of it at load time. ``compact()`` folds the journal into a
+    fresh snapshot written to a temp file and renamed into place.
+
+    Every order carries an in-memory version number that is bumped on each
+    update. Writers take a lock for their order (one of ``ORDER_LOCK_STRIPES``
+    locks chosen by order ID), so updates to different orders mostly run in
+    parallel and share journal fsyncs, while updates to the same order are
+    serialized. Passing ``expected_version`` turns an update into a
+    compare-and-swap that raises ``VersionConflictError`` on a lost race.
+    ``update_many`` changes several orders with a single journal record, so
+    either all of its changes are applied (and survive a crash) or none.
+    Versions are written to the journal as a checkpoint on compaction, so they
+    survive restarts.
+
+    Orders are held as compact ``OrderRecord`` objects and handed out as
+    fresh dicts. With ``binary_snapshot=True`` every JSON snapshot is also
+    written in marshal format to ``<data_file>.snapshot``, stamped with the
+    JSON file's mtime and size. Loading uses it while the stamp still matches
+    and falls back to the JSON file otherwise, e.g. after a manual edit. The
+    binary file is a local cache only; it is never read from anywhere else.
+
+    With ``shared=True`` several processes can use the same files. Writers
+    take an exclusive file lock, catch up on records appended by other
+    processes, then append their own; readers tail the journal on every
+    lookup and reload everything once another process replaced the snapshot.
+    """
+
+    def __init__(self, data_file: str, reload_interval: float = 1.0, fsync: bool = True,
+                 compact_threshold: int = 1000, shared: bool = False, binary_snapshot: bool = True):
+        self.data_file = data_file
+        self.snapshot_file = f"{data_file}.snapshot" if binary_snapshot else None
+        self.reload_interval = reload_interval
+        self.compact_threshold = compact_threshold
+        self.shared = shared
+        self.journal = OrderJournal(f"{data_file}.journal", fsync=fsync)
+        self._file_lock = FileLock(f"{data_file}.lock") if shared else None
+        self._lock = threading.RLock()
+        self._orders: Dict[str, OrderRecord] = {}
+        # Order IDs in file order and their positions, for cursor-based paging
+        self._order_ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._by_customer: Dict[str, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, int] = {}
+        # A fixed set of lock stripes, so memory does not grow with every order ID seen
+        self._order_locks = [threading.Lock() for _ in range(ORDER_LOCK_STRIPES)]
+        self._mtime: Optional[int] = None
+        self._last_check = 0.0
+        self._compactor: Optional[threading.Thread] = None
+        self._compact_requested = threading.Event()
+        self._stop_compactor = threading.Event()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.data_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _index(self, order: OrderRecord) -> None:
+        order_id = order.order_id
+        for index, value in ((self._by_customer, order.customer_name), (self._by_status, order.status)):
+            key = "" if value is MISSING else value.lower()
+            ids = index.get(key)
+            if ids is None:
+                index[key] = {order_id}
+            else:
+                ids.add(order_id)
+
+    def _unindex(self, order: OrderRecord) -> None:
+        order_id = order.order_id
+        for index, value in ((self._by_customer, order.customer_name), (self._by_status, order.status)):
+            key = "" if value is MISSING else value.lower()
+            ids = index.get(key)
+            if ids:
+                ids.discard(order_id)
+                if not ids:
+                    del index[key]
+
+    def _rebuild(self, orders: List[OrderRecord]) -> None:
+        previous = self._orders
+        self._orders = {}
+        self._order_ids = []
+        self._positions = {}
+        self._by_customer = {}
+        self._by_status = {}
+        for order in orders:
+            order_id = order.order_id
+            # Orders changed behind our back (e.g. by editing the file) get a new version
+            if order_id in previous and previous[order_id] != order:
+                self._versions[order_id] = self._versions.get(order_id, 0) + 1
+            if order_id not in self._orders:
+                self._positions[order_id] = len(self._order_ids)
+                self._order_ids.append(order_id)
+            self._orders[order_id] = order
+            self._index(order)
+
+    def _apply(self, order_id: str, fields: Dict) -> bool:
+        """Apply field changes to an indexed order in memory."""
+        order = self._orders.get(order_id)
+        if order is None:
+            return False
+        self._unindex(order)
+        order.update(fields)
+        self._index(order)
+        return True
+
+    def _apply_update(self, update: Dict) -> None:
+        order_id = update["order_id"]
+        if self._apply(order_id, update["fields"]):
+            current_version = self._versions.get(order_id, 0)
+            self._versions[order_id] = max(current_version + 1, update.get("version", 0))
+
+    def _apply_record(self, record: Dict) -> None:
+        if record.get("op") == "update":
+            self._apply_update(record)
+        elif record.get("op") == "batch":
+            for update in record["updates"]:
+                self._apply_update(update)
+        elif record.get("op") == "checkpoint":
+            for order_id, version in record.get("versions", {}).items():
+                self._versions[order_id] = max(self._versions.get(order_id, 0), version)
+
+    def _checkpoint(self) -> Dict:
+        """Journal record carrying the order versions across a compaction."""
+        return {"versions": {order_id: version for order_id, version in self._versions.items()
+                             if version and order_id in self._orders}}
+
+    def _locked(self, exclusive: bool = True):
+        """Hold the inter-process file lock in shared mode (no-op otherwise)."""
+        if self._file_lock is None:
+            return contextlib.nullcontext()
+        return self._file_lock.acquire(exclusive=exclusive)
+
+    def _catch_up(self) -> None:
+        """Pick up changes other processes made to the snapshot or journal.
+
+        Must be called with ``self._lock`` held.
+        """
+        unread = self.journal.unread_bytes()
+        if self._mtime is not None and self._file_mtime() == self._mtime and unread == 0:
+            return
+        with self._locked(exclusive=False):
+            if self._mtime is None or self._file_mtime() != self._mtime or self.journal.unread_bytes() < 0:
+                self.load()
+            else:
+                for record in self.journal.read_new():
+                    self._apply_record(record)
+
+    def _order_lock_stripe(self, order_id: str) -> int:
+        return hash(order_id) % len(self._order_locks)
+
+    def _replace_file(self, path: str, write, mode: str = 'w', fsync: bool = True) -> None:
+        """Atomically replace a file via a temp file and rename."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".order_data.", suffix=".tmp")
+        try:
+            # mkstemp creates the file 0600; keep the permissions of the file it replaces
+            try:
+                shutil.copymode(path, temp_path)
+            except FileNotFoundError:
+                os.chmod(temp_path, 0o666 & ~_UMASK)
+            with os.fdopen(fd, mode) as file:
+                write(file)
+                file.flush()
+                if fsync:
+                    os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_snapshot(self, orders: List[OrderRecord]) -> None:
+        """Atomically replace the data file, then its binary copy."""
+        dicts = [order.to_dict() for order in orders]
+        self._replace_file(self.data_file, lambda file: json.dump(dicts, file, indent=2))
+        del dicts
+        self._write_binary_snapshot(orders, self._snapshot_stamp())
+
+    def _snapshot_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.data_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _write_binary_snapshot(self, orders: List[OrderRecord], stamp: Optional[Tuple[int, int]]) -> None:
+        """Write the binary copy of the data file version identified by ``stamp``.
+
+        It is only a cache, so failures are reported and otherwise ignored.
+        """
+        if self.snapshot_file is None or stamp is None:
+            return
+        try:
+            payload = (BINARY_SNAPSHOT_FORMAT, stamp, [order.to_row() for order in orders])
+            # No fsync: a torn or stale copy fails validation and the JSON is read instead
+            self._replace_file(self.snapshot_file, lambda file: marshal.dump(payload, file), mode='wb', fsync=False)
+        except Exception as e:
+            print(f"Error writing binary order snapshot: {str(e)}")
+
+    def _read_binary_snapshot(self) -> Optional[List[OrderRecord]]:
+        """Orders from the binary copy, or None if it is missing or not of the current data file."""
+        if self.snapshot_file is None:
+            return None
+        try:
+            with open(self.snapshot_file, 'rb') as file:
+                # loads() of the whole file is several times faster than load(file)
+                snapshot_format, stamp, rows = marshal.loads(file.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable binary order snapshot: {str(e)}")
+            return None
+        if snapshot_format != BINARY_SNAPSHOT_FORMAT or stamp is None or stamp != self._snapshot_stamp():
+            return None
+        return [OrderRecord.from_row(row) for row in rows]
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _gc_paused():
+        """Pause the cyclic garbage collector while creating many objects that
+        all stay alive; otherwise it repeatedly scans them for nothing."""
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            yield
+        finally:
+            if enabled:
+                gc.enable()
+
+    def load(self) -> bool:
+        """(Re)load the snapshot, replay the journal on top and rebuild the indexes."""
+        with self._lock, self._locked(exclusive=False), self._gc_paused():
+            mtime = self._file_mtime()
+            orders = self._read_binary_snapshot()
+            if orders is None:
+                # Taken before reading, so a file replaced meanwhile never matches the copy
+                stamp = self._snapshot_stamp()
+                try:
+                    with open(self.data_file, 'r') as file:
+                        orders = [OrderRecord.from_dict(order) for order in json.load(file)]
+                except Exception as e:
+                    print(f"Error reading order data: {str(e)}")
+                    return False
+                # Next time the binary copy can be loaded instead
+                self._write_binary_snapshot(orders, stamp)
+            self._rebuild(orders)
+            for record in self.journal.replay():
+                self._apply_record(record)
+            self._mtime = mtime
+            self._last_check = time.monotonic()
+            return True
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload the data file if it changed since it was last loaded.
+
+        In shared mode the journal is checked on every call (a single stat when
+        nothing changed) and new records from other processes are applied.
+        """
+        now = time.monotonic()
+        if (not force and not self.shared and self._mtime is not None
+                and now - self._last_check < self.reload_interval):
+            return
+        with self._lock:
+            self._last_check = now
+            if self.shared:
+                self._catch_up()
+            elif self._mtime is None or self._file_mtime() != self._mtime:
+                self.load()
+
+    def replace_all(self, orders: List[Dict]) -> None:
+        """Atomically write a complete new snapshot and reset the journal."""
+        with self._lock, self._locked():
+            records = [OrderRecord.from_dict(order) for order in orders]
+            self._write_snapshot(records)
+            self._rebuild(records)
+            self.journal.truncate(self._checkpoint())
+            self._mtime = self._file_mtime()
+            self._last_check = time.monotonic()
+
+    def update(self, order_id: str, fields: Dict, expected_version: Optional[int] = None) -> bool:
+        """Journal and apply field changes to a single order.
+
+        Returns False if the order does not exist. Raises VersionConflictError
+        if ``expected_version`` is given and no longer matches the order, and
+        JournalSyncError if the applied change could not be synced to disk.
+        """
+        self.refresh()
+        with self._order_locks[self._order_lock_stripe(order_id)]:
+            with self._lock, self._locked():
+                if self.shared:
+                    self._catch_up()
+                if order_id not in self._orders:
+                    return False
+                current_version = self._versions.get(order_id, 0)
+                if expected_version is not None and expected_version != current_version:
+                    raise VersionConflictError(order_id, expected_version, current_version)
+                version = current_version + 1
+                self.journal.write({"op": "update", "order_id": order_id, "fields": fields, "version": version})
+                self._apply(order_id, fields)
+                self._versions[order_id] = version
+            # Only this order is held while waiting for the disk
+            self._sync([order_id])
+        if len(self.journal) >= self.compact_threshold:
+            self._compact_requested.set()
+        return True
+
+    def update_many(self, updates: List[Tuple[str, Dict, Optional[int]]]) -> bool:
+        """Atomically journal and apply field changes to several orders.
+
+        ``updates`` holds ``(order_id, fields, expected_version)`` tuples, with
+        at most one per order. Nothing is changed if any order does not exist
+        (returns False) or is no longer at its expected version (raises
+        VersionConflictError). Raises JournalSyncError if the applied changes
+        could not be synced to disk.
+        """
+        order_ids = [order_id for order_id, _, _ in updates]
+        if len(set(order_ids)) != len(order_ids):
+            raise ValueError("Each order may only be updated once per batch")
+        self.refresh()
+        with contextlib.ExitStack() as stack:
+            # Sorted, so concurrent batches cannot deadlock on each other's orders
+            for stripe in sorted({self._order_lock_stripe(order_id) for order_id in order_ids}):
+                stack.enter_context(self._order_locks[stripe])
+            with self._lock, self._locked():
+                if self.shared:
+                    self._catch_up()
+                if any(order_id not in self._orders for order_id in order_ids):
+                    return False
+                records = []
+                for order_id, fields, expected_version in updates:
+                    current_version = self._versions.get(order_id, 0)
+                    if expected_version is not None and expected_version != current_version:
+                        raise VersionConflictError(order_id, expected_version, current_version)
+                    records.append({"order_id": order_id, "fields": fields, "version": current_version + 1})
+                self.journal.write({"op": "batch", "updates": records})
+                for record in records:
+                    self._apply(record["order_id"], record["fields"])
+                    self._versions[record["order_id"]] = record["version"]
+            # Only these orders are held while waiting for the disk
+            self._sync(order_ids)
+        if len(self.journal) >= self.compact_threshold:
+            self._compact_requested.set()
+        return True
+
+    def _sync(self, order_ids: List[str]) -> None:
+        """Sync the journal after applying changes to ``order_ids``."""
+        try:
+            self.journal.sync()
+        except OSError as e:
+            # Already written to the journal file, so it would replay anyway
+            raise JournalSyncError(order_ids, e) from e
+
+    def version(self, order_id: str) -> Optional[int]:
+        """Get the current version of an order, or None if it does not exist."""
+        self.refresh()
+        with self._lock:
+            if order_id not in self._orders:
+                return None
+            return self._versions.get(order_id, 0)
+
+    def _written_elsewhere(self) -> bool:
+        """Whether another process replaced the snapshot or appended to the journal
+        since this store last read them. New journal records are applied.
+
+        Only used without ``shared``, where other processes do not take the file
+        lock; it keeps such a store from folding its stale state over their changes.
+        """
+        if self._file_mtime() != self._mtime or self.journal.unread_bytes() < 0:
+            return True
+        records = self.journal.read_new()
+        for record in records:
+            self._apply_record(record)
+        return bool(records)
+
+    def compact(self) -> bool:
+        """Fold the journal into a fresh snapshot.
+
+        Without ``shared``, compaction is skipped while another process is
+        writing the same files, and the journal is kept if that process
+        appended to it during the snapshot write; it replays on top of the
+        snapshot. Several writers should use ``shared=True``.
+        """
+        with self._lock, self._locked():
+            if self.shared:
+                self._catch_up()
+            elif self._written_elsewhere():
+                return False
+            if not len(self.journal):
+                return False
+            self._write_snapshot(list(self._orders.values()))
+            self._mtime = self._file_mtime()
+            if not self.shared and self._written_elsewhere():
+                return False
+            self.journal.truncate(self._checkpoint())
+            return True
+
+    def start_compactor(self, interval: float = 30.0) -> None:
+        """Start a background thread that compacts the journal periodically,
+        or sooner once it grows past ``compact_threshold`` records."""
+        if self._compactor is not None:
+            return
+
+        def run():
+            while not self._stop_compactor.is_set():
+                self._compact_requested.wait(interval)
+                self._compact_requested.clear()
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Error compacting order journal: {str(e)}")
+
+        self._compactor = threading.Thread(target=run, name="order-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        """Stop the compactor and flush the journal into the snapshot."""
+        self._stop_compactor.set()
+        self._compact_requested.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self.compact()
+        self.journal.close()
+        if self._file_lock is not None:
+            self._file_lock.close()
+
+    def get(self, order_id: str) -> Optional[Dict]:
+        """Get a copy of a single order by ID."""
+        self.refresh()
+        order = self._orders.get(order_id)
+        return order.to_dict() if order else None
+
+    def get_many(self, order_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Get copies of those of the given orders that exist, keyed by order ID."""
+        self.refresh()
+        with self._lock:
+            return {order_id: self._orders[order_id].to_dict()
+                    for order_id in order_ids if order_id in self._orders}
+
+    def versions(self, order_ids: Iterable[str]) -> Dict[str, int]:
+        """Get the current versions of those of the given orders that exist."""
+        self.refresh()
+        with self._lock:
+            return {order_id: self._versions.get(order_id, 0)
+                    for order_id in order_ids if order_id in self._orders}
+
+    def page(self, status: Optional[str] = None, cursor: Optional[str] = None,
+             limit: int = 100) -> Tuple[List[Dict], Optional[str]]:
+        """Get up to ``limit`` orders in file order, optionally only those with a status.
+
+        ``cursor`` is the ID of the last order of the previous page. Returns the
+        orders and the cursor for the next page, or None after the last page.
+        Raises ValueError if the cursor order no longer exists.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.refresh()
+        with self._lock:
+            start = 0
+            if cursor is not None:
+                if cursor not in self._positions:
+                    raise ValueError(f"Unknown cursor: {cursor}")
+                start = self._positions[cursor] + 1
+            matching = self._by_status.get(status.lower(), set()) if status is not None else None
+            page_ids = []
+            for position in range(start, len(self._order_ids)):
+                order_id = self._order_ids[position]
+                if matching is not None and order_id not in matching:
+                    continue
+                if len(page_ids) == limit:
+                    return [self._orders[i].to_dict() for i in page_ids], page_ids[-1]
+                page_ids.append(order_id)
+            return [self._orders[i].to_dict() for i in page_ids], None
+
+    def all(self) -> List[Dict]:
+        """Get copies of all orders in file order."""
+        self.refresh()
+        with self._lock:
+            return [order.to_dict() for order in self._orders.values()]
+
+    def find_by_customer(self, customer_name: str) -> List[Dict]:
+        """Get all orders placed by a customer (case-insensitive)."""
+        self.refresh()
+        with self._lock:
+            ids = self._by_customer.get(customer_name.lower(), ())
+            return [self._orders[order_id].to_dict() for order_id in ids]
+
+    def find_by_status(self, status: str) -> List[Dict]:
+        """Get all orders with a given status (case-insensitive)."""
+        self.refresh()
+        with self._lock:
+            ids = self._by_status.get(status.lower(), ())
+            return [self._orders[order_id].to_dict() for order_id in ids]
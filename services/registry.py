@@ -0,0 +1,82 @@
+import threading
+from typing import Optional
+from langchain_community.chat_models import BedrockChat
+from agents.history import HistoryFormatter
+from services.order_service import OrderService
+from services.sop_service import SOPService
+
+DEFAULT_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+DEFAULT_REGION = "us-west-2"
+
+class ServiceRegistry:
+    """Holds the services and LLM client shared by every agent.
+    
+    Each dependency is created on first use and then reused, so all agents share
+    one pooled Bedrock client, one order index, one SOP service and one history
+    formatter. Instances can
+    also be passed in directly, e.g. to reuse an existing OrderService.
+    
+    With prompt_cache=True the model is called through the Bedrock Converse API
+    (ChatBedrockConverse), which accepts the cache checkpoints agents place
+    after their static system prompts. The model must support prompt caching.
+    """
+    
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, region: str = DEFAULT_REGION,
+                 llm=None, order_service: Optional[OrderService] = None,
+                 sop_service: Optional[SOPService] = None, prompt_cache: bool = False):
+        self.model_id = model_id
+        self.region = region
+        self.prompt_cache = prompt_cache
+        self._llm = llm
+        self._order_service = order_service
+        self._sop_service = sop_service
+        self._history_formatter: Optional[HistoryFormatter] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def llm(self):
+        """The shared Bedrock chat model."""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None and self.prompt_cache:
+                    from langchain_aws import ChatBedrockConverse
+                    self._llm = ChatBedrockConverse(
+                        model=self.model_id,
+                        temperature=0.7,
+                        max_tokens=2048,
+                        region_name=self.region
+                    )
+                elif self._llm is None:
+                    self._llm = BedrockChat(
+                        model_id=self.model_id,
+                        model_kwargs={"temperature": 0.7, "max_tokens": 2048},
+                        region_name=self.region
+                    )
+        return self._llm
+    
+    @property
+    def order_service(self) -> OrderService:
+        """The shared order service."""
+        if self._order_service is None:
+            with self._lock:
+                if self._order_service is None:
+                    self._order_service = OrderService()
+        return self._order_service
+    
+    @property
+    def sop_service(self) -> SOPService:
+        """The shared SOP service."""
+        if self._sop_service is None:
+            with self._lock:
+                if self._sop_service is None:
+                    self._sop_service = SOPService()
+        return self._sop_service
+    
+    @property
+    def history_formatter(self) -> HistoryFormatter:
+        """The shared history formatter, so all agents reuse each other's formatted lines."""
+        if self._history_formatter is None:
+            with self._lock:
+                if self._history_formatter is None:
+                    self._history_formatter = HistoryFormatter()
+        return self._history_formatter
@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+from agents.entities import extract_entities
+
+WORD = re.compile(r"[a-z0-9#]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case the question and drop punctuation and extra whitespace."""
+    return " ".join(WORD.findall(question.lower()))
+
+
+def distinguishing_words(question: str) -> FrozenSet[str]:
+    """Numbers and Middle East places in a normalized question.
+
+    The SOPs branch on amounts (e.g. orders over $200), order ids and regions,
+    so questions that differ in any of them need different answers.
+    """
+    words = {word for word in question.split() if any(char.isdigit() for char in word)}
+    words.update(region.lower() for region in extract_entities(question).regions)
+    return frozenset(words)
+
+
+def order_snapshot(order: Optional[Dict]) -> Optional[Tuple[str, str, str]]:
+    """The order fields a cached response may depend on."""
+    if not order:
+        return None
+    return (order.get("order_id", ""), order.get("status", ""), order.get("address", ""))
+
+
+class ResponseCache:
+    """Cache of agent responses for repeated customer questions.
+
+    Entries are keyed by the normalized question, the recognized intent, a
+    snapshot of the order involved (id, status and address) and the SOP
+    version, so a change to any of them is a miss. ``invalidate_order`` drops
+    every entry for an order as soon as it is updated. Entries expire after
+    ``ttl_seconds`` and the least recently used entry is evicted beyond
+    ``max_entries``; ``max_entries=0`` disables the cache.
+
+    With ``similarity_threshold`` set, a question with no exact match may be
+    answered from an entry for the same intent, order and SOP version whose
+    word set is at least that similar (Jaccard index), which catches
+    near-duplicate phrasings. Both questions must mention the same numbers
+    and regions, as the SOPs branch on them.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # key -> (created_at, response, latency_seconds)
+        self._entries: "OrderedDict[tuple, Tuple[float, str, float]]" = OrderedDict()
+        # (intent, order snapshot, sop version) -> {key: distinguishing words}, for similarity lookups
+        self._by_context: Dict[tuple, Dict[tuple, FrozenSet[str]]] = {}
+        self._by_order: Dict[str, Set[tuple]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "similar_hits": 0, "misses": 0, "invalidations": 0, "saved_seconds": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _context(intent: str, order: Optional[Dict], sop_version: str) -> tuple:
+        return (intent, order_snapshot(order), sop_version)
+
+    def _remove(self, key: tuple) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        context = key[1:]
+        keys = self._by_context.get(context)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_context[context]
+        snapshot = context[1]
+        if snapshot is not None:
+            keys = self._by_order.get(snapshot[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_order[snapshot[0]]
+
+    def _live(self, key: tuple, now: float) -> Optional[Tuple[float, str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds is not None and now - entry[0] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _find_similar(self, question: str, context: tuple, now: float) -> Optional[Tuple[float, str, float]]:
+        words = set(question.split())
+        if not words:
+            return None
+        distinguishing = distinguishing_words(question)
+        best_key, best_score = None, self.similarity_threshold
+        for key, other_distinguishing in self._by_context.get(context, {}).items():
+            if other_distinguishing != distinguishing:
+                continue
+            other = set(key[0].split())
+            score = len(words & other) / len(words | other)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return self._live(best_key, now) if best_key is not None else None
+
+    def get(self, question: str, intent: str, order: Optional[Dict], sop_version: str) -> Optional[str]:
+        """Return the cached response for this question and order state, if any."""
+        if not self.enabled:
+            return None
+        normalized = normalize_question(question)
+        context = self._context(intent, order, sop_version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live((normalized,) + context, now)
+            if entry is not None:
+                self._stats["hits"] += 1
+            elif self.similarity_threshold is not None:
+                entry = self._find_similar(normalized, context, now)
+                if entry is not None:
+                    self._stats["similar_hits"] += 1
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["saved_seconds"] += entry[2]
+            return entry[1]
+
+    def put(self, question: str, intent: str, order: Optional[Dict], sop_version: str,
+            response: str, latency: float = 0.0) -> None:
+        """Cache a response together with how long it took to generate."""
+        if not self.enabled:
+            return
+        context = self._context(intent, order, sop_version)
+        key = (normalize_question(question),) + context
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), response, latency)
+            self._by_context.setdefault(context, {})[key] = distinguishing_words(key[0])
+            if context[1] is not None:
+                self._by_order.setdefault(context[1][0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_order(self, order_id: str) -> None:
+        """Drop every cached response that depends on an order."""
+        with self._lock:
+            keys = self._by_order.pop(order_id, set())
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        hits = stats["hits"] + stats["similar_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["saved_latency_ms"] = stats.pop("saved_seconds") * 1e3
+        return stats
@@ -1,5 +1,27 @@
+import hashlib
+from functools import cached_property
+from services.sop_tree import SOPTree
+
 class SOPService:
-    """Service for managing Standard Operating Procedures (SOP) decision trees."""
+    """Service for managing Standard Operating Procedures (SOP) decision trees.
+    
+    The trees are available as text and, parsed once on first use, as indexed
+    SOPTree structures used to pick the branches relevant to a question.
+    """
+    
+    @cached_property
+    def version(self) -> str:
+        """Content hash of the decision trees; changes whenever an SOP is edited."""
+        content = self.order_decision_tree + self.logistics_decision_tree
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    
+    @cached_property
+    def order_tree(self) -> SOPTree:
+        return SOPTree(self.order_decision_tree)
+    
+    @cached_property
+    def logistics_tree(self) -> SOPTree:
+        return SOPTree(self.logistics_decision_tree)
     
     @property
     def order_decision_tree(self) -> str:
@@ -0,0 +1,190 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+NODE_LINE = re.compile(r'^(\s*)(\d+(?:\.\d+)*)\.\s+(.*)$')
+WORD = re.compile(r"[a-z0-9$<>]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from", "has",
+    "have", "i", "if", "in", "is", "it", "my", "not", "of", "on", "or", "still", "that", "the",
+    "this", "to", "was", "what", "when", "where", "why", "with", "you", "your",
+}
+
+# Customer wording mapped onto the vocabulary used in the decision trees
+SYNONYMS = {
+    "parcel": "package", "shipment": "package", "courier": "carrier", "pick": "pickup",
+    "late": "eta", "delayed": "eta", "delay": "eta", "overdue": "eta",
+}
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so 'delivered', 'delivery' and 'deliver' match."""
+    for suffix in ("ing", "ied", "ies", "ed", "es", "s", "y"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def keywords(text: str) -> Set[str]:
+    return {stem(SYNONYMS.get(word, word)) for word in WORD.findall(text.lower()) if word not in STOPWORDS}
+
+
+class SOPNode:
+    """One numbered step of a decision tree.
+
+    ``condition`` is the text before "->" (the situation the step applies to)
+    and ``action`` the text after it, if any. ``line`` keeps the original
+    line, including its indentation, for rendering.
+    """
+
+    __slots__ = ("node_id", "condition", "action", "line", "depth", "parent", "children")
+
+    def __init__(self, node_id: str, text: str, line: str, depth: int, parent: Optional["SOPNode"]):
+        condition, _, action = text.partition("->")
+        self.node_id = node_id
+        self.condition = condition.strip()
+        self.action = action.strip() or None
+        self.line = line
+        self.depth = depth
+        self.parent = parent
+        self.children: List["SOPNode"] = []
+
+    def ancestors(self) -> List["SOPNode"]:
+        """Ancestors from the top-level section down to the parent."""
+        chain = []
+        node = self.parent
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        return chain[::-1]
+
+    def walk(self) -> Iterable["SOPNode"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class SOPTree:
+    """A decision tree parsed from its text form, with a keyword index.
+
+    Nesting follows the indentation of the numbered lines. Every node is
+    indexed by the stemmed keywords of its line, weighted by how rare they
+    are in the tree, so ``relevant_text(question)`` can render only the
+    branches that a question is about, together with their ancestors and
+    the tree's notes.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.title = ""
+        self.roots: List[SOPNode] = []
+        self.notes: List[str] = []
+        self.nodes: Dict[str, SOPNode] = {}
+        self._index: Dict[str, Set[str]] = {}
+        self._parse(text)
+        self._build_index()
+
+    def _parse(self, text: str) -> None:
+        stack: List[tuple] = []  # (indentation, node)
+        in_notes = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if in_notes or stripped.lower().startswith("note"):
+                in_notes = True
+                self.notes.append(line.rstrip())
+                continue
+            if stripped.startswith("#"):
+                self.title = stripped
+                continue
+            match = NODE_LINE.match(line)
+            if not match:
+                continue
+            indent, node_id, node_text = len(match.group(1)), match.group(2), match.group(3)
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            parent = stack[-1][1] if stack else None
+            node = SOPNode(node_id, node_text, line.rstrip(), len(stack) + 1, parent)
+            (parent.children if parent else self.roots).append(node)
+            self.nodes[node_id] = node
+            stack.append((indent, node))
+
+    def _build_index(self) -> None:
+        for node_id, node in self.nodes.items():
+            for word in keywords(node.condition + " " + (node.action or "")):
+                self._index.setdefault(word, set()).add(node_id)
+        total = len(self.nodes) or 1
+        self._weights = {word: math.log(1 + total / len(ids)) for word, ids in self._index.items()}
+
+    def match(self, question: str, min_score: float = 2.0, relative: float = 0.5) -> List[SOPNode]:
+        """Nodes whose lines share the most (rare) keywords with the question."""
+        scores: Dict[str, float] = {}
+        for word in keywords(question):
+            for node_id in self._index.get(word, ()):
+                scores[node_id] = scores.get(node_id, 0.0) + self._weights[word]
+        if not scores:
+            return []
+        best = max(scores.values())
+        if best < min_score:
+            return []
+        return [self.nodes[node_id] for node_id, score in scores.items() if score >= best * relative]
+
+    def match_conversation(self, question: str, earlier_questions: Iterable[str] = ()) -> List[SOPNode]:
+        """Nodes relevant to a question, given the customer's earlier messages.
+
+        Steps matched by earlier messages stay relevant, so a follow-up such as
+        "I'm very upset" keeps the branch the conversation is in. If the question
+        only matches steps in other top-level sections than those, it is unclear
+        which branch applies and nothing is returned, so callers use the whole tree.
+        """
+        nodes = self.match(question)
+        active: Dict[str, SOPNode] = {}
+        for text in earlier_questions:
+            for node in self.match(text):
+                active[node.node_id] = node
+        if not active:
+            return nodes
+        if nodes and not {self._section(node) for node in nodes} & {self._section(node) for node in active.values()}:
+            return []
+        return list(active.values()) + [node for node in nodes if node.node_id not in active]
+
+    @staticmethod
+    def _section(node: SOPNode) -> str:
+        """Id of the top-level section a node belongs to."""
+        return (node.ancestors() or [node])[0].node_id
+
+    def render(self, nodes: Optional[Iterable[SOPNode]] = None, branch_depth: int = 2) -> str:
+        """Render the given nodes (or the whole tree) in the original text format.
+
+        Each node is shown with its ancestors and the complete branch below its
+        parent, so its sibling conditions stay visible. For nodes deeper than
+        ``branch_depth`` the branch starts at their ancestor at that depth
+        instead; a top-level node is shown with everything below it.
+        """
+        if nodes is None:
+            keep = set(self.nodes)
+        else:
+            keep = set()
+            for node in nodes:
+                lineage = node.ancestors() + [node]
+                branch = lineage[max(min(branch_depth, len(lineage) - 1), 1) - 1]
+                keep.update(ancestor.node_id for ancestor in branch.ancestors())
+                keep.update(descendant.node_id for descendant in branch.walk())
+        lines = [self.title] if self.title else []
+        for root in self.roots:
+            if root.node_id not in keep:
+                continue
+            if len(lines) > 1:
+                lines.append("")
+            lines.extend(node.line for node in root.walk() if node.node_id in keep)
+        if self.notes:
+            lines.append("")
+            lines.extend(self.notes)
+        return "\n".join(lines)
+
+    def relevant_text(self, question: str, earlier_questions: Iterable[str] = ()) -> str:
+        """Render the branches relevant to a question and the customer's earlier
+        messages (see match_conversation), or the whole tree if none match."""
+        nodes = self.match_conversation(question, earlier_questions)
+        return self.render(nodes) if nodes else self.text
@@ -0,0 +1,41 @@
+import re
+from typing import List
+
+# A sentence ends at terminal punctuation (optionally followed by closing quotes
+# or brackets) and whitespace, or at a line break.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])["\')\]]*\s+|\n+')
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, dropping empty fragments."""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+class SentenceChunker:
+    """Incrementally regroups streamed tokens into complete sentences.
+    
+    feed() returns the sentences completed by the new text; the unfinished
+    remainder is buffered until more text arrives or flush() is called.
+    """
+    
+    def __init__(self, min_length: int = 1):
+        self.min_length = min_length
+        self._buffer = ""
+    
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            sentence = self._buffer[start:match.start()].strip()
+            if len(sentence) < self.min_length:
+                continue
+            sentences.append(self._buffer[start:match.end()].strip())
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+    
+    def flush(self) -> str:
+        """Return and clear whatever text is still buffered."""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return remainder
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different renderings share a cache entry."""
+    text = text.replace("’", "'").replace("“", '"').replace("”", '"')
+    return WHITESPACE.sub(" ", text).strip()
+
+
+class TTSCache:
+    """Content-addressed cache for synthesized speech.
+
+    Entries are keyed by a hash of the normalized text, voice ID and output
+    format. A memory tier evicts least recently used audio once it holds more
+    than ``max_bytes``; an optional disk tier under ``cache_dir`` keeps audio
+    across runs and refills the memory tier on a hit.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice_id: str, output_format: str) -> str:
+        material = f"{voice_id}\0{output_format}\0{normalize_text(text)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str, output_format: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{output_format}")
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = audio
+            self._size += len(audio)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, text: str, voice_id: str, output_format: str) -> Optional[bytes]:
+        """Look up cached audio, checking memory first and then disk."""
+        key = self.key(text, voice_id, output_format)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return audio
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key, output_format), "rb") as file:
+                    audio = file.read()
+            except OSError:
+                audio = None
+            if audio is not None:
+                self._remember(key, audio)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return audio
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, text: str, voice_id: str, output_format: str, audio: bytes) -> None:
+        """Store audio in memory and, if configured, on disk."""
+        key = self.key(text, voice_id, output_format)
+        self._remember(key, audio)
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key, output_format)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing TTS cache entry: {str(e)}")
+
+    def get_or_synthesize(self, text: str, voice_id: str, output_format: str,
+                          synthesize: Callable[[str], bytes]) -> bytes:
+        """Return cached audio, synthesizing and caching it on a miss."""
+        audio = self.get(text, voice_id, output_format)
+        if audio is None:
+            audio = synthesize(text)
+            self.put(text, voice_id, output_format, audio)
+        return audio
+
+    def prewarm(self, phrases: Iterable[str], voice_id: str, output_format: str,
+                synthesize: Callable[[str], bytes]) -> None:
+        """Make sure every phrase is cached, synthesizing only the missing ones."""
+        for phrase in phrases:
+            try:
+                self.get_or_synthesize(phrase, voice_id, output_format, synthesize)
+            except Exception as e:
+                print(f"Error prewarming TTS cache: {str(e)}")
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
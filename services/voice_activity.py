@@ -0,0 +1,120 @@
+import math
+from array import array
+from collections import deque
+from typing import NamedTuple
+
+
+class VADResult(NamedTuple):
+    """Outcome of feeding one chunk of audio to the detector."""
+    audio: bytes  # audio worth sending on (speech plus pre-roll/hangover)
+    speech_ended: bool  # trailing silence after speech was detected
+
+
+class EnergyVAD:
+    """Energy-based voice activity detector for 16-bit mono PCM audio.
+
+    Audio is split into short frames whose RMS energy is compared with an
+    adaptive noise floor. Silent frames before speech are held back (only a
+    short pre-roll is kept so the first syllable is not clipped), and once
+    speech has been followed by ``trailing_silence_ms`` of silence the
+    utterance is reported as ended. Up to ``hangover_ms`` of that silence is
+    still passed through so the recognizer can finalize the last word.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20,
+                 threshold_ratio: float = 3.0, min_threshold: float = 300.0,
+                 min_speech_ms: int = 120, trailing_silence_ms: int = 700,
+                 hangover_ms: int = 300, preroll_ms: int = 300,
+                 keepalive_ms: int = 5000, noise_adaptation: float = 0.05):
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.frame_ms = frame_ms
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = min_threshold
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.trailing_silence_frames = max(1, trailing_silence_ms // frame_ms)
+        self.hangover_frames = hangover_ms // frame_ms
+        self.keepalive_frames = max(1, keepalive_ms // frame_ms)
+        self.noise_adaptation = noise_adaptation
+        self._preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self._remainder = b""
+        self.noise_floor = None
+        self.in_speech = False
+        self.speech_ended = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._frames_since_sent = 0
+        self.frames_total = 0
+        self.frames_sent = 0
+
+    def reset(self) -> None:
+        """Wait for the next utterance, keeping the learned noise floor and the counters."""
+        self._preroll.clear()
+        self.in_speech = False
+        self.speech_ended = False
+        self._voiced_run = 0
+        self._silent_run = 0
+
+    @staticmethod
+    def rms(frame: bytes) -> float:
+        samples = array('h', frame)
+        if not samples:
+            return 0.0
+        return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_threshold, (self.noise_floor or 0.0) * self.threshold_ratio)
+
+    def _classify(self, frame: bytes) -> bool:
+        energy = self.rms(frame)
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        voiced = energy > self.threshold
+        if not voiced and not self.in_speech:
+            self.noise_floor += self.noise_adaptation * (energy - self.noise_floor)
+        return voiced
+
+    def process(self, chunk: bytes) -> VADResult:
+        """Feed captured audio; returns the audio to send and whether speech ended."""
+        data = self._remainder + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        outgoing = []
+
+        for offset in range(0, usable, self.frame_bytes):
+            if self.speech_ended:
+                break
+            frame = data[offset:offset + self.frame_bytes]
+            self.frames_total += 1
+            voiced = self._classify(frame)
+
+            if not self.in_speech:
+                self._preroll.append(frame)
+                self._voiced_run = self._voiced_run + 1 if voiced else 0
+                if self._voiced_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._silent_run = 0
+                    outgoing.extend(self._preroll)
+                    self._preroll.clear()
+                elif self._frames_since_sent >= self.keepalive_frames:
+                    # Keep the streaming session alive during long silences
+                    outgoing.append(frame)
+                continue
+
+            if voiced:
+                self._silent_run = 0
+                outgoing.append(frame)
+                continue
+
+            self._silent_run += 1
+            if self._silent_run <= self.hangover_frames:
+                outgoing.append(frame)
+            if self._silent_run >= self.trailing_silence_frames:
+                self.speech_ended = True
+
+        if outgoing:
+            self._frames_since_sent = 0
+        else:
+            self._frames_since_sent += usable // self.frame_bytes
+        self.frames_sent += len(outgoing)
+        return VADResult(b"".join(outgoing), self.speech_ended)